@@ -2,6 +2,11 @@ from passlib.context import CryptContext
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
 from typing import Optional
+from collections import OrderedDict
+import hashlib
+import threading
+import time
+import uuid
 import os
 from dotenv import load_dotenv
 
@@ -10,6 +15,8 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "your-secret-key-change-inproduction")
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 60 * 24 # 24 часа
+# Сколько проверенных токенов держим в памяти
+TOKEN_CACHE_SIZE = int(os.getenv("TOKEN_CACHE_SIZE", "10000"))
 
 # Контекст для хеширования паролей
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -27,13 +34,67 @@ None) -> str:
     else:
         expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
 
+    # jti нужен для отзыва конкретного токена (logout)
+    to_encode.setdefault("jti", uuid.uuid4().hex)
     to_encode.update({"exp": expire})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
 
     return encoded_jwt
+
+class VerifiedTokenCache:
+    """LRU-кеш уже проверенных токенов: ключ — SHA-256 токена, запись живёт до exp"""
+
+    def __init__(self, maxsize: int):
+        self.maxsize = maxsize
+        self._items: "OrderedDict[bytes, tuple[float, dict]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def digest(token: str) -> bytes:
+        return hashlib.sha256(token.encode()).digest()
+
+    def get(self, token: str) -> Optional[dict]:
+        key = self.digest(token)
+        with self._lock:
+            item = self._items.get(key)
+            if item is None:
+                return None
+            expires_at, payload = item
+            if expires_at <= time.time():
+                del self._items[key]
+                return None
+            self._items.move_to_end(key)
+            return payload
+
+    def put(self, token: str, payload: dict) -> None:
+        exp = payload.get("exp")
+        if exp is None or self.maxsize <= 0:
+            return
+        key = self.digest(token)
+        with self._lock:
+            self._items[key] = (float(exp), payload)
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def discard(self, token: str) -> None:
+        with self._lock:
+            self._items.pop(self.digest(token), None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+token_cache = VerifiedTokenCache(TOKEN_CACHE_SIZE)
+
 def decode_access_token(token: str) -> Optional[dict]:
+    # Подпись проверяем только при первом обращении, дальше берём из кеша
+    payload = token_cache.get(token)
+    if payload is not None:
+        return payload
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
-        return payload
     except JWTError:
-        return None
\ No newline at end of file
+        return None
+    token_cache.put(token, payload)
+    return payload
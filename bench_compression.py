@@ -0,0 +1,122 @@
+import asyncio
+import hashlib
+import json
+import random
+import time
+from datetime import datetime, timedelta, timezone
+from compression import (
+    CompressionMiddleware, available_encodings, compress, StreamCompressor, FAST_LEVELS
+)
+
+# Бенчмарк сжатия: сколько байт экономим и сколько CPU тратим на каждом маршруте.
+# Тела ответов синтетические, но повторяют форму ответов API.
+# Запуск: python bench_compression.py
+
+# Те же настройки, что в main.py
+ROUTE_LEVELS = {"/api/v3/admin/users": FAST_LEVELS}
+
+WORDS = ["купить", "молоко", "отчёт", "позвонить", "встреча", "проект", "сдать",
+         "задача", "review", "deploy", "починить", "обновить", "документация"]
+
+def fake_task(task_id: int) -> dict:
+    now = datetime.now(timezone.utc)
+    deadline = now + timedelta(days=random.randint(-5, 30))
+    return {
+        "id": task_id,
+        "title": " ".join(random.choices(WORDS, k=3)),
+        "description": " ".join(random.choices(WORDS, k=12)),
+        "is_important": random.random() < 0.5,
+        "deadline_at": deadline.isoformat(),
+        "quadrant": random.choice(["Q1", "Q2", "Q3", "Q4"]),
+        "completed": random.random() < 0.3,
+        "created_at": now.isoformat(),
+        "completed_at": None,
+        "is_urgent": (deadline - now).days <= 3,
+        "days_until_deadline": (deadline - now).days,
+    }
+
+def build_payloads() -> dict:
+    random.seed(42)
+    tasks = [fake_task(i) for i in range(1, 2001)]
+    deadlines = {
+        "total_pending_with_deadlines": 800,
+        "tasks": [
+            {key: task[key] for key in ("id", "title", "description", "deadline_at", "days_until_deadline")}
+            for task in tasks[:800]
+        ],
+    }
+    users = [
+        {"id": i, "nickname": f"user{i}", "email": f"user{i}@example.com", "role": "user", "task_count": i % 50}
+        for i in range(1, 20001)
+    ]
+    return {
+        "/api/v3": json.dumps(tasks).encode(),
+        "/api/v3/search": json.dumps(tasks[:300]).encode(),
+        "/api/v3/stats/deadlines": json.dumps(deadlines).encode(),
+        # Выгрузка идёт пачками по 1000 строк, как в routers/admin.py
+        "/api/v3/admin/users?format=ndjson": [
+            "".join(json.dumps(user) + "\n" for user in users[i:i + 1000]).encode()
+            for i in range(0, len(users), 1000)
+        ],
+    }
+
+def cpu_ms(func, repeat: int = 5) -> float:
+    start = time.process_time()
+    for _ in range(repeat):
+        func()
+    return (time.process_time() - start) / repeat * 1000
+
+async def cached_ms(path: str, body: bytes, encoding: str) -> float:
+    # Повторный одинаковый ответ: обходимся хешем тела и поиском в кеше
+    async def app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200,
+                    "headers": [(b"content-type", b"application/json")]})
+        await send({"type": "http.response.body", "body": body})
+
+    async def send(message):
+        pass
+
+    scope = {"type": "http", "path": path, "headers": [(b"accept-encoding", encoding.encode())]}
+    wrapped = CompressionMiddleware(app, route_levels=ROUTE_LEVELS)
+    await wrapped(scope, None, send)  # прогрев кеша
+    start = time.process_time()
+    for _ in range(5):
+        await wrapped(scope, None, send)
+    return (time.process_time() - start) / 5 * 1000
+
+def main():
+    middleware = CompressionMiddleware(None, route_levels=ROUTE_LEVELS)
+    payloads = build_payloads()
+
+    print(f"{'route':40} {'enc':5} {'lvl':>3} {'raw KB':>9} {'comp KB':>9} {'saved':>7} {'cpu ms':>8} {'hit ms':>7}")
+    for path, body in payloads.items():
+        route = path.split("?")[0]
+        for encoding in available_encodings():
+            if isinstance(body, list):
+                # Потоковая выгрузка: сжатие по чанкам с flush после каждого
+                level = middleware.level_for(route, encoding, FAST_LEVELS)
+                raw_size = sum(len(chunk) for chunk in body)
+
+                def run_stream():
+                    stream = StreamCompressor(encoding, level)
+                    return sum(len(stream.chunk(chunk)) for chunk in body) + len(stream.finish())
+
+                compressed_size = run_stream()
+                elapsed = cpu_ms(run_stream, repeat=2)
+                hit = float("nan")
+            else:
+                level = middleware.level_for(route, encoding)
+                raw_size = len(body)
+                compressed_size = len(compress(body, encoding, level))
+                elapsed = cpu_ms(lambda: compress(body, encoding, level))
+                hit = asyncio.run(cached_ms(route, body, encoding))
+
+            saved = 1 - compressed_size / raw_size
+            print(f"{path:40} {encoding:5} {level:>3} {raw_size / 1024:>9.1f} "
+                  f"{compressed_size / 1024:>9.1f} {saved:>7.1%} {elapsed:>8.2f} {hit:>7.2f}")
+
+    print(f"\nДля сравнения: SHA-256 тела /api/v3 — "
+          f"{cpu_ms(lambda: hashlib.sha256(payloads['/api/v3']).digest()):.2f} ms")
+
+if __name__ == "__main__":
+    main()
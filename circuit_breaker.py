@@ -0,0 +1,225 @@
+import asyncio
+import os
+import time
+from collections import OrderedDict, deque
+from typing import Any, Hashable, Optional
+from sqlalchemy import event
+from sqlalchemy.exc import InterfaceError, OperationalError
+from sqlalchemy.orm import Session
+
+# Автоматический выключатель (circuit breaker) для БД.
+# CLOSED — запросы идут как обычно, результаты копятся в скользящем окне;
+# OPEN — при высокой доле ошибок или медленных запросов обращения к БД сразу
+# отклоняются (DatabaseUnavailable), не дожидаясь таймаутов;
+# HALF_OPEN — после паузы пропускается один пробный запрос: успех закрывает выключатель.
+# Проверка состояния делается до получения соединения из пула (события сессии),
+# а события пула и курсора только измеряют результат запросов.
+
+DB_BREAKER_WINDOW = float(os.getenv("DB_BREAKER_WINDOW", "30"))  # секунды
+DB_BREAKER_MIN_CALLS = int(os.getenv("DB_BREAKER_MIN_CALLS", "10"))
+DB_BREAKER_FAILURE_RATE = float(os.getenv("DB_BREAKER_FAILURE_RATE", "0.5"))
+DB_BREAKER_SLOW_CALL = float(os.getenv("DB_BREAKER_SLOW_CALL", "2"))  # секунды
+DB_BREAKER_SLOW_RATE = float(os.getenv("DB_BREAKER_SLOW_RATE", "0.8"))
+DB_BREAKER_OPEN_SECONDS = float(os.getenv("DB_BREAKER_OPEN_SECONDS", "15"))
+# Бюджет кеша устаревших ответов в "строках": список задач весит по числу задач
+DB_STALE_CACHE_ROWS = int(os.getenv("DB_STALE_CACHE_ROWS", "20000"))
+
+CLOSED, OPEN, HALF_OPEN = "closed", "open", "half_open"
+
+class DatabaseUnavailable(Exception):
+    """БД недоступна: выключатель разомкнут, запрос отклонён без обращения к БД"""
+
+    def __init__(self, retry_after: float):
+        super().__init__("Database circuit breaker is open")
+        self.retry_after = retry_after
+
+class CircuitBreaker:
+    def __init__(self):
+        self.state = CLOSED
+        # (время, ошибка, медленный) за последние DB_BREAKER_WINDOW секунд;
+        # счётчики обновляются при добавлении и вытеснении — record() за O(1)
+        self._calls = deque()
+        self._failures = 0
+        self._slow = 0
+        self._opened_at = 0.0
+        self._probe_started: Optional[float] = None
+        self.last_failure: Optional[str] = None
+        self.opened_count = 0
+
+    def _trim(self, now: float) -> None:
+        while self._calls and self._calls[0][0] < now - DB_BREAKER_WINDOW:
+            _, failed, slow = self._calls.popleft()
+            self._failures -= failed
+            self._slow -= slow
+
+    def _reset_window(self) -> None:
+        self._calls.clear()
+        self._failures = 0
+        self._slow = 0
+
+    def _open(self, now: float) -> None:
+        self.state = OPEN
+        self._opened_at = now
+        self._probe_started = None
+        self.opened_count += 1
+
+    def retry_after(self) -> float:
+        return max(0.0, self._opened_at + DB_BREAKER_OPEN_SECONDS - time.monotonic())
+
+    def ensure_not_open(self) -> None:
+        # Перед установкой нового соединения: не ждём таймаута подключения, если БД "лежит"
+        if self.state == OPEN and self.retry_after() > 0:
+            raise DatabaseUnavailable(self.retry_after())
+
+    def before_call(self) -> None:
+        """Вызывается перед запросом к БД, до получения соединения из пула"""
+        if self.state == CLOSED:
+            return
+        now = time.monotonic()
+        if self.state == OPEN:
+            if now - self._opened_at < DB_BREAKER_OPEN_SECONDS:
+                raise DatabaseUnavailable(self.retry_after())
+            self.state = HALF_OPEN
+        # HALF_OPEN: пропускаем только один пробный запрос
+        # (зависшую пробу через DB_BREAKER_OPEN_SECONDS заменяем новой)
+        if self._probe_started is not None and now - self._probe_started < DB_BREAKER_OPEN_SECONDS:
+            raise DatabaseUnavailable(DB_BREAKER_OPEN_SECONDS)
+        self._probe_started = now
+
+    def record(self, ok: bool, duration: float = 0.0, error: Optional[BaseException] = None) -> None:
+        now = time.monotonic()
+        if not ok:
+            self.last_failure = repr(error)
+        if self.state == HALF_OPEN:
+            if ok and duration < DB_BREAKER_SLOW_CALL:
+                self.state = CLOSED
+                self._reset_window()
+                self._probe_started = None
+            else:
+                self._open(now)
+            return
+        if self.state == OPEN:
+            return
+
+        failed, slow = not ok, duration >= DB_BREAKER_SLOW_CALL
+        self._calls.append((now, failed, slow))
+        self._failures += failed
+        self._slow += slow
+        self._trim(now)
+        total = len(self._calls)
+        if total < DB_BREAKER_MIN_CALLS:
+            return
+        if self._failures / total >= DB_BREAKER_FAILURE_RATE or self._slow / total >= DB_BREAKER_SLOW_RATE:
+            self._open(now)
+
+    def snapshot(self) -> dict:
+        now = time.monotonic()
+        self._trim(now)
+        total = len(self._calls)
+        return {
+            "state": self.state,
+            "calls_in_window": total,
+            "failure_rate": round(self._failures / total, 3) if total else 0.0,
+            "slow_rate": round(self._slow / total, 3) if total else 0.0,
+            "retry_after": round(self.retry_after(), 1) if self.state == OPEN else 0,
+            "opened_count": self.opened_count,
+            "last_failure": self.last_failure,
+        }
+
+    def instrument(self, engine, session_class=Session) -> None:
+        """Подключает выключатель к событиям сессий и движка SQLAlchemy (AsyncEngine)"""
+        sync_engine = engine.sync_engine
+
+        # Отказ — до получения соединения: исключение из события пула "checkout"
+        # заставило бы SQLAlchemy закрыть исправное соединение
+        @event.listens_for(session_class, "do_orm_execute")
+        def _before_execute_orm(orm_execute_state):
+            self.before_call()
+
+        @event.listens_for(session_class, "before_flush")
+        def _before_flush(session, flush_context, instances):
+            self.before_call()
+
+        @event.listens_for(sync_engine, "do_connect")
+        def _before_connect(dialect, conn_rec, cargs, cparams):
+            # Новое соединение ещё не создано — отказ здесь ничего не теряет
+            self.ensure_not_open()
+
+        @event.listens_for(sync_engine, "before_cursor_execute")
+        def _before_execute(conn, cursor, statement, parameters, context, executemany):
+            conn.info.setdefault("breaker_started", []).append(time.perf_counter())
+
+        @event.listens_for(sync_engine, "after_cursor_execute")
+        def _after_execute(conn, cursor, statement, parameters, context, executemany):
+            started = conn.info["breaker_started"].pop()
+            self.record(True, time.perf_counter() - started)
+
+        @event.listens_for(sync_engine, "handle_error")
+        def _on_error(context):
+            if context.connection is not None:
+                started = context.connection.info.get("breaker_started")
+                if started:
+                    started.pop()
+            # Ошибки приложения (нарушение ограничений, синтаксис) о здоровье БД не говорят
+            original = context.original_exception
+            if (
+                context.is_disconnect
+                or isinstance(context.sqlalchemy_exception, (OperationalError, InterfaceError))
+                or isinstance(original, (asyncio.TimeoutError, TimeoutError, OSError))
+            ):
+                self.record(False, error=original)
+
+class StaleCache:
+    """
+    Последние удачные ответы чтения (по пользователю и параметрам).
+    Пока выключатель разомкнут, их можно отдать с пометкой X-Stale.
+    Размер ограничен суммарным весом записей (примерно — числом строк), а не числом записей.
+    """
+
+    def __init__(self, max_rows: int = DB_STALE_CACHE_ROWS):
+        self.max_rows = max_rows
+        self._items: "OrderedDict[Hashable, tuple[float, Any, int]]" = OrderedDict()
+        self.size = 0
+
+    def put(self, key: Hashable, value: Any, weight: int = 1) -> None:
+        # Ответ тяжелее четверти бюджета вытеснил бы почти всё остальное — не кешируем
+        weight = max(weight, 1)
+        if weight > self.max_rows // 4:
+            self.discard(key)
+            return
+        self.discard(key)
+        self._items[key] = (time.time(), value, weight)
+        self.size += weight
+        while self.size > self.max_rows:
+            _, (_, _, evicted) = self._items.popitem(last=False)
+            self.size -= evicted
+
+    def discard(self, key: Hashable) -> None:
+        item = self._items.pop(key, None)
+        if item is not None:
+            self.size -= item[2]
+
+    def get(self, key: Hashable):
+        """Возвращает (возраст в секундах, значение) или None"""
+        item = self._items.get(key)
+        if item is None:
+            return None
+        stored_at, value, _ = item
+        return time.time() - stored_at, value
+
+    def serve(self, response, key: Hashable, error: DatabaseUnavailable):
+        # Отдаём устаревший ответ или пробрасываем ошибку (-> 503)
+        item = self.get(key)
+        if item is None:
+            raise error
+        age, value = item
+        response.headers["X-Stale"] = "true"
+        response.headers["Age"] = str(int(age))
+        response.headers["Warning"] = '110 - "Response is Stale"'
+        return value
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+db_breaker = CircuitBreaker()
+stale_cache = StaleCache()
@@ -0,0 +1,267 @@
+# ASGI-middleware сжатия ответов (zstd / br / gzip) с выбором по Accept-Encoding.
+# brotli и zstandard — необязательные зависимости: если пакет не установлен,
+# соответствующая кодировка просто не предлагается клиенту.
+import asyncio
+import gzip
+import hashlib
+import zlib
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# Уровни сжатия по умолчанию и "быстрый" профиль для потоковых выгрузок
+DEFAULT_LEVELS = {"zstd": 3, "br": 4, "gzip": 6}
+FAST_LEVELS = {"zstd": 1, "br": 1, "gzip": 1}
+
+# Какие типы содержимого имеет смысл сжимать
+COMPRESSIBLE_TYPES = ("application/json", "application/x-ndjson", "text/")
+
+# Тела больше этого размера сжимаем в потоке, чтобы не блокировать event loop
+THREAD_THRESHOLD = 256 * 1024
+
+def available_encodings() -> List[str]:
+    """Поддерживаемые кодировки в порядке предпочтения сервера"""
+    encodings = []
+    if zstandard is not None:
+        encodings.append("zstd")
+    if brotli is not None:
+        encodings.append("br")
+    encodings.append("gzip")
+    return encodings
+
+def negotiate_encoding(accept_encoding: str, encodings: List[str]) -> Optional[str]:
+    """Выбирает кодировку из заголовка Accept-Encoding (учитывает q=0 и "*")"""
+    accepted: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        token, _, params = part.strip().partition(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        quality = 1.0
+        # Параметры регистронезависимы, q может стоять не первым: "gzip; level=1; Q=0"
+        for param in params.split(";"):
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    quality = float(value.strip())
+                except ValueError:
+                    quality = 0.0
+        accepted[token] = quality
+
+    for encoding in encodings:
+        quality = accepted.get(encoding, accepted.get("*", 0.0))
+        if quality > 0:
+            return encoding
+    return None
+
+def compress(body: bytes, encoding: str, level: int) -> bytes:
+    if encoding == "zstd":
+        return zstandard.ZstdCompressor(level=level).compress(body)
+    if encoding == "br":
+        return brotli.compress(body, quality=level)
+    return gzip.compress(body, compresslevel=level, mtime=0)
+
+class StreamCompressor:
+    """Потоковое сжатие: каждый чанк сразу сбрасывается клиенту (flush)"""
+
+    def __init__(self, encoding: str, level: int):
+        self.encoding = encoding
+        if encoding == "zstd":
+            self._obj = zstandard.ZstdCompressor(level=level).compressobj()
+        elif encoding == "br":
+            self._obj = brotli.Compressor(quality=level)
+        else:
+            # wbits=16+MAX_WBITS — формат gzip (заголовок и CRC)
+            self._obj = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def chunk(self, data: bytes) -> bytes:
+        if self.encoding == "zstd":
+            return self._obj.compress(data) + self._obj.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+        if self.encoding == "br":
+            return self._obj.process(data) + self._obj.flush()
+        return self._obj.compress(data) + self._obj.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        if self.encoding == "zstd":
+            return self._obj.flush()
+        if self.encoding == "br":
+            return self._obj.finish()
+        return self._obj.flush()
+
+class CompressedBodyCache:
+    """
+    LRU уже сжатых тел: ключ — (кодировка, уровень, SHA-256 исходного тела).
+    Повторный одинаковый ответ (например, тот же список задач) не сжимается заново.
+    Размер ограничен суммарным объёмом сжатых тел, а не числом записей.
+    """
+
+    def __init__(self, max_bytes: int = 16 * 1024 * 1024, max_body_size: int = 1024 * 1024):
+        self.max_bytes = max_bytes
+        self.max_body_size = min(max_body_size, max_bytes)
+        self._items: "OrderedDict[Tuple[str, int, bytes], bytes]" = OrderedDict()
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key) -> Optional[bytes]:
+        value = self._items.get(key)
+        if value is None:
+            self.misses += 1
+            return None
+        self._items.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key, value: bytes) -> None:
+        if len(value) > self.max_body_size:
+            return
+        previous = self._items.pop(key, None)
+        if previous is not None:
+            self.size -= len(previous)
+        self._items[key] = value
+        self.size += len(value)
+        while self.size > self.max_bytes:
+            _, evicted = self._items.popitem(last=False)
+            self.size -= len(evicted)
+
+class CompressionMiddleware:
+    """
+    Сжимает ответы, если клиент это поддерживает и тело не меньше minimum_size.
+    route_levels: префикс пути -> уровни по кодировкам (побеждает самый длинный префикс).
+    Потоковые ответы (StreamingResponse) сжимаются по чанкам быстрым профилем.
+    """
+
+    def __init__(
+        self,
+        app,
+        minimum_size: int = 1024,
+        route_levels: Optional[Dict[str, Dict[str, int]]] = None,
+        cache_bytes: int = 16 * 1024 * 1024,
+    ):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.route_levels = sorted((route_levels or {}).items(), key=lambda item: len(item[0]), reverse=True)
+        self.encodings = available_encodings()
+        self.cache = CompressedBodyCache(cache_bytes)
+
+    def level_for(self, path: str, encoding: str, defaults: Dict[str, int] = DEFAULT_LEVELS) -> int:
+        for prefix, levels in self.route_levels:
+            if path.startswith(prefix) and encoding in levels:
+                return levels[encoding]
+        return defaults[encoding]
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope["headers"]:
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = negotiate_encoding(accept_encoding, self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        responder = _CompressionResponder(self, send, encoding, scope["path"])
+        await self.app(scope, receive, responder.send)
+
+class _CompressionResponder:
+    def __init__(self, middleware: CompressionMiddleware, send, encoding: str, path: str):
+        self.middleware = middleware
+        self._send = send
+        self.encoding = encoding
+        self.path = path
+        self.start_message = None
+        self.active: Optional[bool] = None  # None — ещё не решили, сжимать ли
+        self.stream: Optional[StreamCompressor] = None
+
+    def _is_compressible(self) -> bool:
+        if self.start_message["status"] in (204, 304):
+            return False
+        content_type = ""
+        for name, value in self.start_message["headers"]:
+            if name == b"content-encoding":
+                return False
+            if name == b"content-type":
+                content_type = value.decode("latin-1")
+        return content_type.startswith(COMPRESSIBLE_TYPES)
+
+    def _set_headers(self, content_length: Optional[int]) -> None:
+        headers = [
+            (name, value) for name, value in self.start_message["headers"]
+            if name not in (b"content-length", b"content-encoding")
+        ]
+        headers.append((b"content-encoding", self.encoding.encode()))
+        headers.append((b"vary", b"Accept-Encoding"))
+        if content_length is not None:
+            headers.append((b"content-length", str(content_length).encode()))
+        self.start_message["headers"] = headers
+
+    async def _compress_body(self, body: bytes) -> bytes:
+        level = self.middleware.level_for(self.path, self.encoding)
+        key = (self.encoding, level, hashlib.sha256(body).digest())
+        compressed = self.middleware.cache.get(key)
+        if compressed is None:
+            if len(body) >= THREAD_THRESHOLD:
+                compressed = await asyncio.to_thread(compress, body, self.encoding, level)
+            else:
+                compressed = compress(body, self.encoding, level)
+            self.middleware.cache.put(key, compressed)
+        return compressed
+
+    async def send(self, message) -> None:
+        if message["type"] == "http.response.start":
+            # Откладываем заголовки до первого чанка тела
+            self.start_message = {**message, "headers": list(message.get("headers", []))}
+            return
+
+        if message["type"] != "http.response.body":
+            await self._send(message)
+            return
+
+        body = message.get("body", b"")
+        more_body = message.get("more_body", False)
+
+        if self.active is None:
+            self.active = self._is_compressible()
+            if self.active and not more_body and len(body) < self.middleware.minimum_size:
+                self.active = False
+
+            if not self.active:
+                await self._send(self.start_message)
+                await self._send(message)
+                return
+
+            if not more_body:
+                compressed = await self._compress_body(body)
+                self._set_headers(len(compressed))
+                await self._send(self.start_message)
+                await self._send({"type": "http.response.body", "body": compressed})
+                return
+
+            # Потоковый ответ: длина заранее неизвестна, сжимаем по чанкам
+            level = self.middleware.level_for(self.path, self.encoding, FAST_LEVELS)
+            self.stream = StreamCompressor(self.encoding, level)
+            self._set_headers(None)
+            await self._send(self.start_message)
+
+        if not self.active:
+            await self._send(message)
+            return
+
+        data = self.stream.chunk(body) if body else b""
+        if not more_body:
+            data += self.stream.finish()
+        await self._send({"type": "http.response.body", "body": data, "more_body": more_body})
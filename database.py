@@ -3,6 +3,7 @@ from sqlalchemy.orm import DeclarativeBase # базовый класс для м
 from typing import AsyncGenerator
 import os
 from dotenv import load_dotenv
+from circuit_breaker import db_breaker
 
 try:
      from models import Base, Task
@@ -14,10 +15,22 @@ load_dotenv()
 
 DATABASE_URL = os.getenv("DATABASE_URL")
 
+# Таймауты, чтобы зависшая БД превращалась в ошибку, а не в бесконечное ожидание
+DB_CONNECT_TIMEOUT = float(os.getenv("DB_CONNECT_TIMEOUT", "5"))
+DB_COMMAND_TIMEOUT = float(os.getenv("DB_COMMAND_TIMEOUT", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+
 engine = create_async_engine(
     DATABASE_URL,
-    connect_args={"statement_cache_size": 0}
+    pool_timeout=DB_POOL_TIMEOUT,
+    connect_args={
+        "statement_cache_size": 0,
+        "timeout": DB_CONNECT_TIMEOUT,
+        "command_timeout": DB_COMMAND_TIMEOUT
+    }
 )
+# Circuit breaker: при отказах БД запросы отклоняются сразу (см. circuit_breaker.py)
+db_breaker.instrument(engine)
 
 AsyncSessionLocal = async_sessionmaker(
     bind=engine,
@@ -5,16 +5,24 @@ from sqlalchemy import select
 from database import get_async_session
 from models import User, UserRole
 from auth_utils import decode_access_token
+from token_revocation import revocation_list
+from circuit_breaker import DatabaseUnavailable, stale_cache
 from typing import Optional
+from dataclasses import dataclass
 
 # OAuth2 схема для получения токена из заголовка Authorization
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="/api/v3/auth/login")
 
-#Аутентификация
-async def get_current_user(
-    token: str = Depends(oauth2_scheme),
-    db: AsyncSession = Depends(get_async_session)
-) -> User:
+@dataclass(frozen=True)
+class UserSnapshot:
+    """Неизменяемая копия пользователя для чтений из кеша, пока БД недоступна"""
+    id: int
+    nickname: str
+    email: str
+    role: UserRole
+    token_epoch: int
+
+async def _authenticate(token: str, db: AsyncSession, allow_stale: bool):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Не удалось проверить учетные данные",
@@ -29,16 +37,59 @@ async def get_current_user(
     if user_id is None:
         raise credentials_exception
 
+    # Проверка отзыва токена (logout): в обычном случае без запроса к БД,
+    # фильтр обновляется фоновой задачей (см. token_revocation.py)
+    jti = payload.get("jti")
+    if jti is not None:
+        if await revocation_list.is_revoked(db, jti):
+            raise credentials_exception
+
     # Поиск пользователя в БД
-    result = await db.execute(
-        select(User).where(User.id == int(user_id))
-    )
-    user = result.scalar_one_or_none()
+    try:
+        result = await db.execute(
+            select(User).where(User.id == int(user_id))
+        )
+        user = result.scalar_one_or_none()
+    except DatabaseUnavailable:
+        # БД недоступна: для чтений берём последний известный снимок пользователя,
+        # чтобы отдать устаревшие данные из кеша; запись получит 503
+        cached = stale_cache.get(("user", int(user_id))) if allow_stale else None
+        if cached is None:
+            raise
+        user = cached[1]
+    else:
+        if user is not None:
+            stale_cache.put(("user", user.id), UserSnapshot(
+                id=user.id,
+                nickname=user.nickname,
+                email=user.email,
+                role=user.role,
+                token_epoch=user.token_epoch
+            ))
 
     if user is None:
         raise credentials_exception
 
+    # Токены, выданные до "выхода везде" или смены пароля, недействительны
+    if payload.get("epoch", 0) != user.token_epoch:
+        raise credentials_exception
+
     return user
+
+#Аутентификация
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_session)
+) -> User:
+    return await _authenticate(token, db, allow_stale=False)
+
+# Для GET-маршрутов, умеющих отдавать устаревший ответ: при недоступной БД
+# возвращает UserSnapshot (только чтение), а не объект User
+async def get_current_user_for_read(
+    token: str = Depends(oauth2_scheme),
+    db: AsyncSession = Depends(get_async_session)
+):
+    return await _authenticate(token, db, allow_stale=True)
 # Авторизация, возвращает объект User, асли пользователь является администратором
 async def get_current_admin(
     current_user: User = Depends(get_current_user)
@@ -1,9 +1,16 @@
-from fastapi import FastAPI, Depends
+from fastapi import FastAPI, Depends, Request
+from fastapi.responses import JSONResponse
 from contextlib import asynccontextmanager
-from database import init_db, get_async_session
+from database import init_db, get_async_session, engine
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, text
 from routers import tasks, stats, auth, admin
+from compression import CompressionMiddleware, FAST_LEVELS
+from reminders import reminder_scheduler
+from profiling import ProfilingMiddleware, PROFILING_ENABLED
+from circuit_breaker import DatabaseUnavailable, db_breaker, stale_cache
+from token_revocation import revocation_list
+import os
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
@@ -12,11 +19,21 @@ async def lifespan(app: FastAPI):
     print(" Инициализация базы данных...")
     # Создаем таблицы (если их нет)
     await init_db()
+    # Фильтр отозванных токенов: первая загрузка и фоновая синхронизация
+    await revocation_list.start()
+    # Планировщик напоминаний о дедлайнах; при REMINDER_SCHEDULER=off
+    # он запускается отдельным процессом: python reminders.py
+    scheduler_enabled = os.getenv("REMINDER_SCHEDULER", "on") != "off"
+    if scheduler_enabled:
+        await reminder_scheduler.start()
     print(" Приложение готово к работе!")
     yield # Здесь приложение работает
 
     # Код ПОСЛЕ yield выполняется при ОСТАНОВКЕ
     print(" Остановка приложения...")
+    if scheduler_enabled:
+        await reminder_scheduler.stop()
+    await revocation_list.stop()
 
 app = FastAPI(
     title="ToDo лист API",
@@ -27,6 +44,27 @@ app = FastAPI(
     },
     lifespan=lifespan # Подключаем lifespan
 )
+# Профилирование запросов для администраторов (подключается только при PROFILING_ENABLED=1)
+if PROFILING_ENABLED:
+    app.add_middleware(ProfilingMiddleware)
+# Сжатие ответов: маленькие тела (< 1 КБ) отдаём как есть,
+# для выгрузки пользователей (NDJSON) — быстрый профиль, чтобы не тратить CPU на поток
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=1024,
+    route_levels={
+        "/api/v3/admin/users": FAST_LEVELS,
+    }
+)
+# Выключатель БД разомкнут и устаревшего ответа нет — сразу 503 вместо ожидания таймаута
+@app.exception_handler(DatabaseUnavailable)
+async def database_unavailable_handler(request: Request, exc: DatabaseUnavailable):
+    return JSONResponse(
+        status_code=503,
+        content={"detail": "База данных временно недоступна, повторите запрос позже"},
+        headers={"Retry-After": str(max(1, round(exc.retry_after)))}
+    )
+
 app.include_router(tasks.router, prefix="/api/v3") # подключение роутера к приложению
 app.include_router(stats.router, prefix="/api/v3")
 app.include_router(auth.router, prefix="/api/v3")
@@ -58,4 +96,38 @@ async def health_check(
     return {
         "status": "healthy",
         "database": db_status
-    }
\ No newline at end of file
+    }
+@app.get("/ready")
+async def readiness_check(
+    db: AsyncSession = Depends(get_async_session)
+):
+    """
+    Готовность к приёму трафика: состояние circuit breaker, пула соединений и проверка БД.
+    Пока выключатель разомкнут, возвращает 503 (чтения при этом обслуживаются из кеша).
+    """
+    try:
+        await db.execute(text("SELECT 1"))
+        db_status = "connected"
+    except DatabaseUnavailable:
+        db_status = "circuit_open"
+    except Exception:
+        db_status = "disconnected"
+
+    pool = engine.pool
+    ready = db_status == "connected"
+    return JSONResponse(
+        status_code=200 if ready else 503,
+        content={
+            "status": "ready" if ready else "degraded",
+            "database": db_status,
+            "circuit_breaker": db_breaker.snapshot(),
+            "pool": {
+                "size": pool.size(),
+                "checked_in": pool.checkedin(),
+                "checked_out": pool.checkedout(),
+                "overflow": pool.overflow()
+            },
+            "stale_cache_entries": len(stale_cache),
+            "stale_cache_rows": stale_cache.size
+        }
+    )
@@ -1,5 +1,7 @@
 from models.task import Task
 from database import Base
 from models.user import User, UserRole
+from models.revoked_token import RevokedToken
+from models.reminder import ReminderOutbox
 
-__all__ = ["Base, Task, User, UserRole"]
\ No newline at end of file
+__all__ = ["Base, Task, User, UserRole, RevokedToken, ReminderOutbox"]
\ No newline at end of file
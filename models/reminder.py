@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from database import Base
+
+class ReminderOutbox(Base):
+    __tablename__ = "reminder_outbox"
+
+    id = Column(Integer, primary_key=True, index=True)
+    task_id = Column(Integer, ForeignKey("tasks.id", ondelete="CASCADE"), nullable=False)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    title = Column(String(100), nullable=False)
+    deadline_at = Column(DateTime(timezone=True), nullable=False)
+    remind_at = Column(DateTime(timezone=True), nullable=False)
+    # Одно напоминание на пару (задача, дедлайн): повторная запись игнорируется
+    dedup_key = Column(String(64), nullable=False, unique=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now(), nullable=False)
+    dispatched_at = Column(DateTime(timezone=True), nullable=True)
+    attempts = Column(Integer, nullable=False, default=0, server_default="0")
+    # Аренда: запись взята диспетчером на отправку до этого момента (потом её можно взять снова)
+    claimed_until = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Очередь на отправку: только неотправленные записи
+        Index("ix_reminder_outbox_pending", "id", postgresql_where=dispatched_at.is_(None)),
+    )
+
+    def __repr__(self) -> str:
+        return f"<ReminderOutbox(id={self.id}, task_id={self.task_id}, dedup_key='{self.dedup_key}')>"
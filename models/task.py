@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey
+from sqlalchemy import Column, Integer, String, Boolean, DateTime, Text, ForeignKey, Index, UniqueConstraint, DDL, event
 from sqlalchemy.sql import func
 from database import Base
 from datetime import datetime, timezone
@@ -19,6 +19,35 @@ class Task(Base):
     completed_at = Column(DateTime(timezone=True), nullable=True)
     deadline_at = Column(DateTime(timezone=True), nullable=True)  # Новое поле
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
+    # Повторяющаяся задача (серия): правило в стиле RRULE, deadline_at — первое повторение
+    recurrence_rule = Column(String(200), nullable=True)
+    # Первое ещё не сохранённое повторение серии (NULL — серия закончилась)
+    next_occurrence_at = Column(DateTime(timezone=True), nullable=True)
+    # Последнее повторение по COUNT/UNTIL (NULL — серия бесконечна)
+    last_occurrence_at = Column(DateTime(timezone=True), nullable=True)
+    # Сохранённое повторение: ссылка на серию и исходное время повторения
+    series_id = Column(Integer, ForeignKey("tasks.id", ondelete="SET NULL"), nullable=True)
+    occurrence_at = Column(DateTime(timezone=True), nullable=True)
+
+    __table_args__ = (
+        # Выбор серий, у которых есть повторения в запрошенном окне:
+        # last_occurrence_at в индексе отсекает закончившиеся серии без чтения строк
+        Index(
+            "ix_tasks_user_next_occurrence",
+            "user_id",
+            "next_occurrence_at",
+            "last_occurrence_at",
+            postgresql_where=recurrence_rule.isnot(None)
+        ),
+        UniqueConstraint("series_id", "occurrence_at", name="uq_tasks_series_occurrence"),
+        # Планировщик напоминаний читает невыполненные задачи по диапазону дедлайнов
+        Index(
+            "ix_tasks_pending_deadline",
+            "deadline_at",
+            "id",
+            postgresql_where=(completed == False) & deadline_at.isnot(None)
+        ),
+    )
 
     owner = relationship("User", back_populates="tasks")
     @property
@@ -51,8 +80,44 @@ class Task(Base):
             "completed_at": self.completed_at,
             "deadline_at": self.deadline_at,
             "days_until_deadline": self.days_until_deadline,  # Расчётное поле
-            "user_id": self.user_id
+            "user_id": self.user_id,
+            "recurrence_rule": self.recurrence_rule,
+            "series_id": self.series_id,
+            "occurrence_at": self.occurrence_at
         }
 
     def __repr__(self):
-        return f"<Task(id={self.id}, title='{self.title}', quadrant='{self.quadrant}')>"
\ No newline at end of file
+        return f"<Task(id={self.id}, title='{self.title}', quadrant='{self.quadrant}')>"
+
+# users.task_count поддерживает триггер в БД, а не события ORM: так счётчик верен
+# и для Core insert(Task)/delete(Task), и для изменений в обход приложения.
+# create_all ставит триггер только на новые таблицы — для существующей БД
+# выполните этот же SQL вручную. Сверка, если счётчик всё же разошёлся:
+#   UPDATE users u SET task_count = c.n
+#   FROM (SELECT u2.id, count(t.id) AS n FROM users u2
+#         LEFT JOIN tasks t ON t.user_id = u2.id GROUP BY u2.id) c
+#   WHERE u.id = c.id AND u.task_count <> c.n;
+TASK_COUNT_FUNCTION = DDL("""
+CREATE OR REPLACE FUNCTION tasks_maintain_task_count() RETURNS trigger AS $$
+BEGIN
+    IF TG_OP = 'UPDATE' AND OLD.user_id = NEW.user_id THEN
+        RETURN NULL;
+    END IF;
+    IF TG_OP IN ('DELETE', 'UPDATE') THEN
+        UPDATE users SET task_count = task_count - 1 WHERE id = OLD.user_id;
+    END IF;
+    IF TG_OP IN ('INSERT', 'UPDATE') THEN
+        UPDATE users SET task_count = task_count + 1 WHERE id = NEW.user_id;
+    END IF;
+    RETURN NULL;
+END;
+$$ LANGUAGE plpgsql
+""")
+TASK_COUNT_TRIGGER = DDL("""
+CREATE TRIGGER tasks_task_count
+AFTER INSERT OR DELETE OR UPDATE OF user_id ON tasks
+FOR EACH ROW EXECUTE FUNCTION tasks_maintain_task_count()
+""")
+# Отдельными командами: asyncpg не выполняет несколько SQL-команд в одном запросе
+event.listen(Task.__table__, "after_create", TASK_COUNT_FUNCTION.execute_if(dialect="postgresql"))
+event.listen(Task.__table__, "after_create", TASK_COUNT_TRIGGER.execute_if(dialect="postgresql"))
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum as SQLEnum
+from sqlalchemy import Column, Integer, String, Index, Enum as SQLEnum, func
 from sqlalchemy.orm import relationship
 from database import Base
 
@@ -43,11 +43,47 @@ class User(Base):
         default=UserRole.USER # По умолчанию - обычный пользователь
     )
 
+    # Эпоха токенов: увеличение делает недействительными все ранее выданные токены
+    token_epoch = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0"
+    )
+
+    # Предрасчитанное число задач: поддерживается триггером tasks_task_count (см. models/task.py)
+    task_count = Column(
+        Integer,
+        nullable=False,
+        default=0,
+        server_default="0"
+    )
+
     # Связь с задачами (один пользователь -> много задач)
     tasks = relationship(
         "Task",
         back_populates="owner", # Обратная связь
         cascade="all, delete-orphan" # При удалении пользователя удаляются его задачи
     )
+
+    # Регистронезависимая уникальность: "Foo@x.ru" и "foo@x.ru" — один и тот же email.
+    # varchar_pattern_ops позволяет тем же индексам обслуживать поиск по префиксу (LIKE 'abc%')
+    __table_args__ = (
+        Index(
+            "uq_users_email_lower",
+            func.lower(email).label("email_lower"),
+            unique=True,
+            postgresql_ops={"email_lower": "varchar_pattern_ops"}
+        ),
+        Index(
+            "uq_users_nickname_lower",
+            func.lower(nickname).label("nickname_lower"),
+            unique=True,
+            postgresql_ops={"nickname_lower": "varchar_pattern_ops"}
+        ),
+        # Keyset-пагинация админского списка по числу задач
+        Index("ix_users_task_count_id", task_count, id),
+    )
+
     def __repr__(self) -> str:
         return f"<User(id={self.id}, nickname='{self.nickname}', role='{self.role.value}')>"
\ No newline at end of file
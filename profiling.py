@@ -0,0 +1,317 @@
+import asyncio
+import itertools
+import json
+import os
+import random
+import sys
+import threading
+import time
+import weakref
+from collections import deque
+from contextvars import ContextVar
+from datetime import datetime, timezone
+from typing import Dict, List, Optional
+from database import AsyncSessionLocal
+from dependencies import get_current_user, get_current_admin
+
+# Профилирование отдельных запросов для администраторов.
+# Семплирующий профайлер на stdlib: фоновый поток периодически снимает стек
+# потока event loop (sys._current_frames) и копит одинаковые стеки с весами.
+# Поток event loop общий, поэтому в профиль попадают только снимки, сделанные,
+# пока выполняется задача профилируемого запроса или порождённая ею задача.
+# Результат — JSON в формате speedscope (https://www.speedscope.app).
+# При PROFILING_ENABLED != "1" middleware не подключается вовсе — накладных расходов нет.
+
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "0") == "1"
+PROFILING_INTERVAL = float(os.getenv("PROFILING_INTERVAL_MS", "1")) / 1000
+# Для фонового семплирования — реже: частый опрос стеков отнимает GIL у остальных запросов
+PROFILING_SAMPLED_INTERVAL = float(os.getenv("PROFILING_SAMPLED_INTERVAL_MS", "10")) / 1000
+PROFILING_BUFFER_SIZE = int(os.getenv("PROFILING_BUFFER_SIZE", "50"))
+# Фоновое семплирование: "префикс=доля" через запятую, например "/api/v3/stats=0.01"
+PROFILING_SAMPLE_RATES = os.getenv("PROFILING_SAMPLE_RATES", "")
+
+def parse_sample_rates(text: str) -> Dict[str, float]:
+    rates = {}
+    for item in text.split(","):
+        prefix, sep, rate = item.strip().partition("=")
+        if sep:
+            rates[prefix] = float(rate)
+    return rates
+
+# Профилировщик текущего запроса: наследуется задачами, созданными в его контексте
+_current_profiler: ContextVar[Optional["SamplingProfiler"]] = ContextVar("current_profiler", default=None)
+
+def _install_task_factory(loop) -> None:
+    """Отмечает задачи, созданные профилируемым запросом (например, потоковый ответ)"""
+    previous = loop.get_task_factory()
+    if getattr(previous, "_profiling", False):
+        return
+
+    def factory(loop, coro, **kwargs):
+        if previous is not None:
+            task = previous(loop, coro, **kwargs)
+        else:
+            task = asyncio.Task(coro, loop=loop, **kwargs)
+        # Фабрика вызывается в контексте создающей задачи
+        profiler = _current_profiler.get()
+        if profiler is not None:
+            profiler.tasks.add(task)
+        return task
+
+    factory._profiling = True
+    loop.set_task_factory(factory)
+
+class SamplingProfiler:
+    """
+    Снимает стек указанного потока каждые interval секунд, пока запущен.
+    Если задан loop, учитываются только снимки, когда в нём выполняется одна из tasks.
+    """
+
+    def __init__(self, thread_id: int, interval: float = PROFILING_INTERVAL, loop=None, in_flight=None):
+        self.thread_id = thread_id
+        self.interval = interval
+        self.loop = loop
+        self.tasks = weakref.WeakSet()
+        # Функция, возвращающая число запросов в обработке (для оценки "шума" в профиле)
+        self.in_flight = in_flight
+        self.max_in_flight = 0
+        self.stacks: Dict[tuple, float] = {}
+        self.sample_count = 0
+        self.foreign_samples = 0
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="request-profiler", daemon=True)
+
+    def _run(self) -> None:
+        last = time.perf_counter()
+        while not self._stop.wait(self.interval):
+            if self.in_flight is not None:
+                self.max_in_flight = max(self.max_in_flight, self.in_flight())
+            task = asyncio.current_task(self.loop) if self.loop is not None else None
+            frame = sys._current_frames().get(self.thread_id)
+            now = time.perf_counter()
+            if frame is None:
+                continue
+            if self.loop is not None:
+                # Снимок принадлежит запросу, только если задача не сменилась за время снимка
+                if task is None or task not in self.tasks or asyncio.current_task(self.loop) is not task:
+                    self.foreign_samples += 1
+                    last = now
+                    continue
+            stack = []
+            while frame is not None:
+                code = frame.f_code
+                stack.append((code.co_name, code.co_filename, frame.f_lineno))
+                frame = frame.f_back
+            stack.reverse()  # от корня к листу
+            key = tuple(stack)
+            # Вес — реальное время между снимками (поток может ждать GIL дольше interval)
+            self.stacks[key] = self.stacks.get(key, 0.0) + (now - last)
+            self.sample_count += 1
+            last = now
+
+    def start(self) -> None:
+        self.started = time.perf_counter()
+        self._thread.start()
+
+    def stop(self) -> float:
+        self._stop.set()
+        self._thread.join()
+        self.duration = time.perf_counter() - self.started
+        return self.duration
+
+    def to_speedscope(self, name: str) -> dict:
+        frames: List[dict] = []
+        index: Dict[tuple, int] = {}
+        samples, weights = [], []
+        for stack, weight in self.stacks.items():
+            sample = []
+            for frame in stack:
+                if frame not in index:
+                    index[frame] = len(frames)
+                    frames.append({"name": frame[0], "file": frame[1], "line": frame[2]})
+                sample.append(index[frame])
+            samples.append(sample)
+            weights.append(weight)
+        return {
+            "$schema": "https://www.speedscope.app/file-format-schema.json",
+            "name": name,
+            "exporter": "todo-api",
+            "shared": {"frames": frames},
+            "profiles": [{
+                "type": "sampled",
+                "name": name,
+                "unit": "seconds",
+                "startValue": 0,
+                "endValue": sum(weights),
+                "samples": samples,
+                "weights": weights,
+            }],
+        }
+
+class ProfileStore:
+    """Кольцевой буфер последних профилей + настройки фонового семплирования"""
+
+    def __init__(self, maxlen: int = PROFILING_BUFFER_SIZE):
+        self._items = deque(maxlen=maxlen)
+        self._ids = itertools.count(1)
+        self.sample_rates = parse_sample_rates(PROFILING_SAMPLE_RATES)
+        # Профилировать можно только один запрос за раз: стек потока общий
+        self.busy = False
+        # Запросов в обработке сейчас (все HTTP-запросы проходят через middleware)
+        self.in_flight = 0
+
+    def rate_for(self, path: str) -> float:
+        best = ""
+        for prefix in self.sample_rates:
+            if path.startswith(prefix) and len(prefix) > len(best):
+                best = prefix
+        return self.sample_rates.get(best, 0.0) if best else 0.0
+
+    def next_id(self) -> int:
+        return next(self._ids)
+
+    def add(self, profile_id: int, method: str, path: str, status: Optional[int], reason: str,
+            profiler: SamplingProfiler) -> dict:
+        name = f"{method} {path}"
+        item = {
+            "id": profile_id,
+            "method": method,
+            "path": path,
+            "status": status,
+            "reason": reason,  # "admin" — по запросу, "sampled" — фоновое семплирование
+            "created_at": datetime.now(timezone.utc).isoformat(),
+            "duration_ms": round(profiler.duration * 1000, 3),
+            "samples": profiler.sample_count,
+            # Снимки, пришедшиеся на другие запросы (в профиль не вошли)
+            "foreign_samples": profiler.foreign_samples,
+            "max_requests_in_flight": profiler.max_in_flight,
+            "profile": profiler.to_speedscope(name),
+        }
+        self._items.append(item)
+        return item
+
+    def list(self) -> List[dict]:
+        return [
+            {key: value for key, value in item.items() if key != "profile"}
+            for item in reversed(self._items)
+        ]
+
+    def get(self, profile_id: int) -> Optional[dict]:
+        for item in self._items:
+            if item["id"] == profile_id:
+                return item
+        return None
+
+profile_store = ProfileStore()
+
+async def _is_admin(authorization: str) -> bool:
+    # Та же проверка, что и в зависимостях get_current_user / get_current_admin
+    scheme, _, token = authorization.partition(" ")
+    if scheme.lower() != "bearer" or not token:
+        return False
+    try:
+        async with AsyncSessionLocal() as session:
+            user = await get_current_user(token, session)
+            await get_current_admin(user)
+        return True
+    except Exception:
+        return False
+
+class ProfilingMiddleware:
+    """
+    X-Profile: 1 (или ?profile=1) от администратора — профиль сохраняется,
+    его id возвращается в заголовке X-Profile-Id; X-Profile: return (?profile=return) —
+    вместо ответа возвращается сам профиль в формате speedscope.
+    Кроме того, доля запросов по префиксам пути профилируется в фоне.
+    """
+
+    def __init__(self, app, store: ProfileStore = profile_store):
+        self.app = app
+        self.store = store
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        self.store.in_flight += 1
+        try:
+            await self._handle(scope, receive, send)
+        finally:
+            self.store.in_flight -= 1
+
+    async def _handle(self, scope, receive, send):
+        flag, authorization = None, ""
+        for name, value in scope["headers"]:
+            if name == b"x-profile":
+                flag = value.decode("latin-1")
+            elif name == b"authorization":
+                authorization = value.decode("latin-1")
+        if flag is None and b"profile=" in scope.get("query_string", b""):
+            for pair in scope["query_string"].decode("latin-1").split("&"):
+                key, _, value = pair.partition("=")
+                if key == "profile":
+                    flag = value
+
+        reason = None
+        if flag and flag != "0" and await _is_admin(authorization):
+            reason = "admin"
+        elif self.store.sample_rates and random.random() < self.store.rate_for(scope["path"]):
+            reason = "sampled"
+            flag = None
+
+        if reason is None or self.store.busy:
+            await self.app(scope, receive, send)
+            return
+
+        self.store.busy = True
+        profile_id = self.store.next_id()
+        return_profile = flag == "return"
+        status_holder = {}
+
+        async def send_wrapper(message):
+            if message["type"] == "http.response.start":
+                status_holder["status"] = message["status"]
+                if return_profile:
+                    return
+                if reason == "admin":
+                    headers = list(message.get("headers", []))
+                    headers.append((b"x-profile-id", str(profile_id).encode()))
+                    message = {**message, "headers": headers}
+            elif return_profile and message["type"] == "http.response.body":
+                return  # тело исходного ответа заменяется профилем
+            await send(message)
+
+        loop = asyncio.get_running_loop()
+        _install_task_factory(loop)
+        profiler = SamplingProfiler(
+            threading.get_ident(),
+            PROFILING_INTERVAL if reason == "admin" else PROFILING_SAMPLED_INTERVAL,
+            loop=loop,
+            in_flight=lambda: self.store.in_flight
+        )
+        profiler.tasks.add(asyncio.current_task())
+        token = _current_profiler.set(profiler)
+        profiler.start()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            profiler.stop()
+            _current_profiler.reset(token)
+            self.store.busy = False
+            item = self.store.add(
+                profile_id, scope["method"], scope["path"], status_holder.get("status"), reason, profiler
+            )
+
+        if return_profile:
+            body = json.dumps(item["profile"]).encode()
+            await send({
+                "type": "http.response.start",
+                "status": 200,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode()),
+                    (b"x-profile-id", str(profile_id).encode()),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
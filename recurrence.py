@@ -0,0 +1,168 @@
+from datetime import datetime, timedelta, timezone
+from typing import List, Optional
+from fastapi import HTTPException, status
+from sqlalchemy import select, or_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import Task
+from recurrence_rule import RecurrenceRule, as_utc, MAX_OCCURRENCES_PER_SERIES
+
+# Повторяющиеся задачи: в БД хранится только "серия" (задача с recurrence_rule),
+# отдельные повторения вычисляются на лету и сохраняются строкой в tasks
+# только когда пользователь их выполняет или редактирует.
+
+# Окно разворачивания: не длиннее года
+MAX_WINDOW = timedelta(days=366)
+DEFAULT_WINDOW = timedelta(days=30)
+
+def compute_quadrant(is_important: bool, is_urgent: bool) -> str:
+    if is_important and is_urgent:
+        return "Q1"
+    if is_important:
+        return "Q2"
+    if is_urgent:
+        return "Q3"
+    return "Q4"
+
+def is_urgent_at(deadline_at: Optional[datetime]) -> bool:
+    # То же правило, что в Task.is_urgent: до дедлайна не больше 3 дней
+    if deadline_at is None:
+        return False
+    return (as_utc(deadline_at) - datetime.now(timezone.utc)).days <= 3
+
+def resolve_window(start: Optional[datetime], end: Optional[datetime]):
+    """Окно разворачивания повторений: по умолчанию с начала сегодняшнего дня на 30 дней вперёд"""
+    if start is None:
+        start = datetime.now(timezone.utc).replace(hour=0, minute=0, second=0, microsecond=0)
+    start = as_utc(start)
+    end = as_utc(end) if end is not None else start + DEFAULT_WINDOW
+    if end <= start:
+        raise HTTPException(status_code=400, detail="Конец окна должен быть позже начала")
+    if end - start > MAX_WINDOW:
+        raise HTTPException(status_code=400, detail="Окно не может быть длиннее 366 дней")
+    return start, end
+
+def make_occurrence(series: Task, occurrence_at: datetime) -> Task:
+    # Несохранённый объект Task без id: повторение задаётся парой series_id + occurrence_at,
+    # менять его можно только через /{series_id}/occurrences/{occurrence_at}
+    return Task(
+        id=None,
+        title=series.title,
+        description=series.description,
+        is_important=series.is_important,
+        quadrant=compute_quadrant(series.is_important, is_urgent_at(occurrence_at)),
+        completed=False,
+        created_at=series.created_at,
+        deadline_at=occurrence_at,
+        user_id=series.user_id,
+        recurrence_rule=series.recurrence_rule,
+        series_id=series.id,
+        occurrence_at=occurrence_at
+    )
+
+async def expand_occurrences(
+    db: AsyncSession,
+    start: datetime,
+    end: datetime,
+    user_id: Optional[int] = None
+) -> List[Task]:
+    """
+    Виртуальные повторения всех серий в окне [start, end).
+    Серии выбираются по индексу на next_occurrence_at / last_occurrence_at, поэтому
+    закончившиеся (по COUNT или UNTIL) и ещё не начавшиеся серии не читаются вовсе.
+    """
+    # Выполненная (закрытая) серия больше не порождает повторений
+    query = select(Task).where(
+        Task.recurrence_rule.isnot(None),
+        Task.completed == False,
+        Task.next_occurrence_at.isnot(None),
+        Task.next_occurrence_at < end,
+        or_(Task.last_occurrence_at.is_(None), Task.last_occurrence_at >= start)
+    )
+    if user_id is not None:
+        query = query.where(Task.user_id == user_id)
+    series_list = (await db.execute(query)).scalars().all()
+    if not series_list:
+        return []
+
+    # Повторения, уже сохранённые строкой, отдаются как обычные задачи
+    result = await db.execute(
+        select(Task.series_id, Task.occurrence_at).where(
+            Task.series_id.in_([series.id for series in series_list]),
+            Task.occurrence_at >= start,
+            Task.occurrence_at < end
+        )
+    )
+    materialized = set(result.all())
+
+    occurrences = []
+    for series in series_list:
+        try:
+            rule = RecurrenceRule.parse(series.recurrence_rule)
+        except ValueError:
+            # Правило, сохранённое до введения ограничений, не ломает чтение остальных задач
+            continue
+        window_start = max(start, as_utc(series.next_occurrence_at))
+        for occurrence_at in rule.between(series.deadline_at, window_start, end):
+            if (series.id, occurrence_at) not in materialized:
+                occurrences.append(make_occurrence(series, occurrence_at))
+    return occurrences
+
+async def first_free_occurrence(
+    db: AsyncSession,
+    series: Task,
+    start: datetime
+) -> Optional[datetime]:
+    """Первое ещё не сохранённое повторение серии, начиная со start (значение для next_occurrence_at)"""
+    rule = RecurrenceRule.parse(series.recurrence_rule)
+    result = await db.execute(
+        select(Task.occurrence_at).where(
+            Task.series_id == series.id,
+            Task.occurrence_at >= start
+        )
+    )
+    materialized = set(result.scalars())
+    for occurrence_at in rule.occurrences(series.deadline_at, start):
+        if occurrence_at not in materialized:
+            return occurrence_at
+    return None
+
+async def materialize_occurrence(
+    db: AsyncSession,
+    series: Task,
+    occurrence_at: datetime,
+    changes: dict
+) -> Task:
+    """Сохраняет повторение отдельной строкой (при выполнении или редактировании)"""
+    occurrence_at = as_utc(occurrence_at)
+    if not series.recurrence_rule:
+        raise HTTPException(status_code=400, detail="Задача не является повторяющейся")
+    rule = RecurrenceRule.parse(series.recurrence_rule)
+    if not rule.is_occurrence(series.deadline_at, occurrence_at):
+        raise HTTPException(status_code=404, detail="Повторение не найдено")
+
+    task = make_occurrence(series, occurrence_at)
+    task.id = None
+    task.created_at = None
+    task.recurrence_rule = None
+    for field, value in changes.items():
+        setattr(task, field, value)
+    task.quadrant = compute_quadrant(task.is_important, is_urgent_at(task.deadline_at))
+    db.add(task)
+
+    try:
+        await db.flush()
+        # Индекс серии указывает на первое несохранённое повторение
+        if series.next_occurrence_at is not None and as_utc(series.next_occurrence_at) == occurrence_at:
+            series.next_occurrence_at = await first_free_occurrence(
+                db, series, occurrence_at + timedelta(microseconds=1)
+            )
+        await db.commit()
+    except IntegrityError:
+        await db.rollback()
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Это повторение уже сохранено как отдельная задача"
+        )
+    await db.refresh(task)
+    return task
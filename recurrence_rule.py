@@ -0,0 +1,217 @@
+import calendar
+from datetime import MAXYEAR, datetime, timedelta, timezone
+from typing import Iterator, List, Optional
+
+# Правило повторения (подмножество RRULE) — чистая логика без БД и FastAPI,
+# используется схемами и recurrence.py.
+
+FREQUENCIES = ("DAILY", "WEEKLY", "MONTHLY", "YEARLY")
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+
+# Не больше 1000 повторений на серию (и при разворачивании окна, и в COUNT)
+MAX_OCCURRENCES_PER_SERIES = 1000
+# INTERVAL — не больше 10 лет в единицах частоты
+MAX_INTERVAL = {"DAILY": 3660, "WEEKLY": 522, "MONTHLY": 120, "YEARLY": 10}
+
+def as_utc(value: datetime) -> datetime:
+    # Даты без часового пояса считаем UTC
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value
+
+class RecurrenceRule:
+    """Подмножество RRULE (RFC 5545): FREQ, INTERVAL, COUNT, UNTIL, BYDAY (для WEEKLY)"""
+
+    def __init__(self, freq: str, interval: int = 1, count: Optional[int] = None,
+                 until: Optional[datetime] = None, byday: Optional[List[int]] = None):
+        self.freq = freq
+        self.interval = interval
+        self.count = count
+        self.until = until
+        self.byday = byday
+
+    @classmethod
+    def parse(cls, text: str) -> "RecurrenceRule":
+        parts = {}
+        for item in text.strip().upper().removeprefix("RRULE:").split(";"):
+            if not item:
+                continue
+            key, sep, value = item.partition("=")
+            if not sep or not value:
+                raise ValueError(f"Неверный элемент правила повторения: {item}")
+            parts[key] = value
+
+        freq = parts.pop("FREQ", None)
+        if freq not in FREQUENCIES:
+            raise ValueError("FREQ должен быть одним из: " + ", ".join(FREQUENCIES))
+        try:
+            interval = int(parts.pop("INTERVAL", "1"))
+            count = int(parts["COUNT"]) if "COUNT" in parts else None
+        except ValueError:
+            raise ValueError("INTERVAL и COUNT должны быть целыми числами")
+        parts.pop("COUNT", None)
+        if interval < 1 or (count is not None and count < 1):
+            raise ValueError("INTERVAL и COUNT должны быть положительными")
+        if interval > MAX_INTERVAL[freq]:
+            raise ValueError(f"INTERVAL для FREQ={freq} не больше {MAX_INTERVAL[freq]} (10 лет)")
+        if count is not None and count > MAX_OCCURRENCES_PER_SERIES:
+            raise ValueError(f"COUNT не больше {MAX_OCCURRENCES_PER_SERIES}")
+
+        until = None
+        if "UNTIL" in parts:
+            raw = parts.pop("UNTIL")
+            try:
+                until = datetime.strptime(raw, "%Y%m%dT%H%M%SZ") if "T" in raw else datetime.strptime(raw, "%Y%m%d")
+            except ValueError:
+                raise ValueError("UNTIL должен быть в формате YYYYMMDD или YYYYMMDDTHHMMSSZ")
+            if "T" not in raw:
+                until += timedelta(days=1, microseconds=-1)  # включительно до конца дня
+            until = until.replace(tzinfo=timezone.utc)
+        if count is not None and until is not None:
+            raise ValueError("COUNT и UNTIL нельзя указывать вместе")
+
+        byday = None
+        if "BYDAY" in parts:
+            if freq != "WEEKLY":
+                raise ValueError("BYDAY поддерживается только для FREQ=WEEKLY")
+            try:
+                byday = sorted({WEEKDAYS[day] for day in parts.pop("BYDAY").split(",")})
+            except KeyError:
+                raise ValueError("BYDAY: допустимы MO, TU, WE, TH, FR, SA, SU")
+
+        if parts:
+            raise ValueError("Неподдерживаемые параметры: " + ", ".join(sorted(parts)))
+        return cls(freq, interval, count, until, byday)
+
+    def __str__(self) -> str:
+        parts = [f"FREQ={self.freq}"]
+        if self.interval != 1:
+            parts.append(f"INTERVAL={self.interval}")
+        if self.byday:
+            names = {number: name for name, number in WEEKDAYS.items()}
+            parts.append("BYDAY=" + ",".join(names[day] for day in self.byday))
+        if self.count is not None:
+            parts.append(f"COUNT={self.count}")
+        if self.until is not None:
+            parts.append("UNTIL=" + self.until.strftime("%Y%m%dT%H%M%SZ"))
+        return ";".join(parts)
+
+    def _weekdays(self, dtstart: datetime) -> List[int]:
+        return self.byday or [dtstart.weekday()]
+
+    def _period(self, dtstart: datetime, p: int) -> Optional[List[datetime]]:
+        # Кандидаты в p-м периоде (день / неделя / месяц / год с учётом INTERVAL);
+        # None — период за пределами представимых дат (после 9999 года): серия закончилась
+        try:
+            if self.freq == "DAILY":
+                return [dtstart + timedelta(days=p * self.interval)]
+            if self.freq == "WEEKLY":
+                week_start = dtstart - timedelta(days=dtstart.weekday()) + timedelta(weeks=p * self.interval)
+                return [week_start + timedelta(days=day) for day in self._weekdays(dtstart)]
+        except OverflowError:
+            return None
+        if self.freq == "MONTHLY":
+            month_index = dtstart.month - 1 + p * self.interval
+            year, month = dtstart.year + month_index // 12, month_index % 12 + 1
+            if year > MAXYEAR:
+                return None
+            # Как в RFC 5545: 31-е число пропускается в месяцах, где его нет
+            if dtstart.day > calendar.monthrange(year, month)[1]:
+                return []
+            return [dtstart.replace(year=year, month=month)]
+        year = dtstart.year + p * self.interval
+        if year > MAXYEAR:
+            return None
+        if not self._has_period(dtstart, p):  # 29 февраля в невисокосный год
+            return []
+        return [dtstart.replace(year=year)]
+
+    def _has_period(self, dtstart: datetime, p: int) -> bool:
+        # Есть ли повторение в p-м периоде MONTHLY/YEARLY (31-е число, 29 февраля)
+        if self.freq == "MONTHLY":
+            month_index = dtstart.month - 1 + p * self.interval
+            year, month = dtstart.year + month_index // 12, month_index % 12 + 1
+            return dtstart.day <= calendar.monthrange(year, month)[1]
+        return not (dtstart.month == 2 and dtstart.day == 29) or calendar.isleap(dtstart.year + p * self.interval)
+
+    def _skip_to(self, dtstart: datetime, start: datetime):
+        # Сразу переходим к периоду, содержащему start, не перебирая прошлые;
+        # возвращает (номер периода, число повторений в предыдущих периодах)
+        if start <= dtstart:
+            return 0, 0
+        if self.freq == "DAILY":
+            p = (start - dtstart) // timedelta(days=self.interval)
+            return p, p
+        if self.freq == "WEEKLY":
+            week_start = dtstart - timedelta(days=dtstart.weekday())
+            p = (start - week_start) // timedelta(weeks=self.interval)
+            if p == 0:
+                return 0, 0
+            first_period = sum(1 for occurrence in self._period(dtstart, 0) or [] if occurrence >= dtstart)
+            return p, first_period + (p - 1) * len(self._weekdays(dtstart))
+        if self.freq == "MONTHLY":
+            p = ((start.year - dtstart.year) * 12 + start.month - dtstart.month) // self.interval
+        else:
+            p = (start.year - dtstart.year) // self.interval
+        # Номер повторения нужен только для COUNT; до 28-го числа повторение есть в каждом периоде
+        if self.count is None or (dtstart.day <= 28 and not (dtstart.month == 2 and dtstart.day == 29)):
+            return p, p
+        return p, sum(1 for q in range(p) if self._has_period(dtstart, q))
+
+    def occurrences(self, dtstart: datetime, start: Optional[datetime] = None) -> Iterator[datetime]:
+        """Повторения по порядку, начиная с start (включительно)"""
+        dtstart = as_utc(dtstart)
+        start = as_utc(start) if start is not None else dtstart
+        p, index = self._skip_to(dtstart, start)
+        while True:
+            candidates = self._period(dtstart, p)
+            if candidates is None:
+                return
+            for occurrence in candidates:
+                if occurrence < dtstart:
+                    continue
+                if self.count is not None and index >= self.count:
+                    return
+                if self.until is not None and occurrence > self.until:
+                    return
+                index += 1
+                if occurrence >= start:
+                    yield occurrence
+            p += 1
+
+    def between(self, dtstart: datetime, start: datetime, end: datetime,
+                limit: int = MAX_OCCURRENCES_PER_SERIES) -> List[datetime]:
+        result = []
+        for occurrence in self.occurrences(dtstart, start):
+            if occurrence >= end or len(result) >= limit:
+                break
+            result.append(occurrence)
+        return result
+
+    def first(self, dtstart: datetime, start: Optional[datetime] = None) -> Optional[datetime]:
+        return next(self.occurrences(dtstart, start), None)
+
+    def is_occurrence(self, dtstart: datetime, moment: datetime) -> bool:
+        return self.first(dtstart, moment) == as_utc(moment)
+
+    def last(self, dtstart: datetime) -> Optional[datetime]:
+        """Последнее повторение по COUNT или UNTIL (None — серия бесконечна или пуста)"""
+        dtstart = as_utc(dtstart)
+        if self.until is not None:
+            p, _ = self._skip_to(dtstart, self.until)
+            while p >= 0:
+                candidates = [
+                    occurrence for occurrence in self._period(dtstart, p) or []
+                    if dtstart <= occurrence <= self.until
+                ]
+                if candidates:
+                    return max(candidates)
+                p -= 1
+            return None
+        if self.count is None:
+            return None
+        # COUNT ограничен MAX_OCCURRENCES_PER_SERIES, поэтому перебор короткий
+        occurrence = None
+        for occurrence in self.occurrences(dtstart):
+            pass
+        return occurrence
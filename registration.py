@@ -0,0 +1,130 @@
+import asyncio
+import os
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor
+from fastapi import HTTPException, status
+from typing import List, Optional, Sequence
+from sqlalchemy import select, func, or_
+from sqlalchemy.dialects.postgresql import insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from models import User, UserRole
+from schemas_auth import UserCreate
+from auth_utils import get_password_hash
+
+EMAIL_TAKEN = "Пользователь с таким email уже существует"
+NICKNAME_TAKEN = "Пользователь с таким никнеймом уже существует"
+
+# bcrypt считается в собственном пуле потоков: общий пул по умолчанию нужен сжатию
+# ответов и отправке напоминаний, и массовая регистрация не должна его занимать
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", "4"))
+_hash_executor = ThreadPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, thread_name_prefix="bcrypt")
+# Массовая регистрация занимает не все потоки пула — одиночным регистрациям остаётся хотя бы один
+_bulk_hash_slots = asyncio.Semaphore(max(1, PASSWORD_HASH_WORKERS - 1))
+
+async def hash_password_async(password: str) -> str:
+    # bcrypt нагружает CPU, поэтому считаем его в потоке, не блокируя event loop
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_hash_executor, get_password_hash, password)
+
+async def _hash_password_bulk(password: str) -> str:
+    async with _bulk_hash_slots:
+        return await hash_password_async(password)
+
+async def find_conflict(db: AsyncSession, email: str, nickname: str) -> Optional[str]:
+    """Один запрос вместо двух: возвращает текст ошибки или None, если email и никнейм свободны"""
+    result = await db.execute(
+        select(func.lower(User.email), func.lower(User.nickname))
+        .where(or_(
+            func.lower(User.email) == email.lower(),
+            func.lower(User.nickname) == nickname.lower()
+        ))
+        .limit(2)
+    )
+    rows = result.all()
+    if any(row[0] == email.lower() for row in rows):
+        return EMAIL_TAKEN
+    if rows:
+        return NICKNAME_TAKEN
+    return None
+
+async def insert_users(
+    db: AsyncSession,
+    users: Sequence[UserCreate],
+    hashed_passwords: Sequence[str],
+    role: UserRole = UserRole.USER
+) -> List[User]:
+    """
+    Вставка одним INSERT ... ON CONFLICT DO NOTHING RETURNING.
+    Конфликт по уникальным индексам lower(email)/lower(nickname) не вызывает
+    IntegrityError — такая строка просто не попадает в результат.
+    """
+    stmt = (
+        insert(User)
+        .values([
+            {
+                "nickname": user.nickname,
+                "email": user.email,
+                "hashed_password": hashed,
+                "role": role,
+            }
+            for user, hashed in zip(users, hashed_passwords)
+        ])
+        .on_conflict_do_nothing()
+        .returning(User)
+    )
+    result = await db.scalars(stmt)
+    created = list(result)
+    await db.commit()
+    return created
+
+async def register_user(db: AsyncSession, user_data: UserCreate) -> User:
+    # Хеширование пароля идёт параллельно с проверкой уникальности
+    hash_task = asyncio.ensure_future(hash_password_async(user_data.password))
+    try:
+        conflict = await find_conflict(db, user_data.email, user_data.nickname)
+        if conflict:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=conflict)
+        hashed = await hash_task
+    finally:
+        if not hash_task.done():
+            hash_task.cancel()
+
+    created = await insert_users(db, [user_data], [hashed])
+    if not created:
+        # Проверку обогнала параллельная регистрация — выясняем, что именно занято
+        conflict = await find_conflict(db, user_data.email, user_data.nickname)
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=conflict or EMAIL_TAKEN)
+    return created[0]
+
+async def register_users_bulk(db: AsyncSession, users: Sequence[UserCreate]):
+    """Массовая регистрация: возвращает (созданные пользователи, пропущенные с причиной)"""
+    hashed = await asyncio.gather(*(_hash_password_bulk(user.password) for user in users))
+    created = await insert_users(db, users, hashed)
+
+    # Порядок RETURNING не гарантирован, поэтому сопоставляем по паре (email, nickname)
+    created_keys = Counter((user.email.lower(), user.nickname.lower()) for user in created)
+    rejected = []
+    for user in users:
+        key = (user.email.lower(), user.nickname.lower())
+        if created_keys[key]:
+            created_keys[key] -= 1
+        else:
+            rejected.append(user)
+    if not rejected:
+        return created, []
+
+    # Одним запросом узнаём, какие email уже заняты (в БД или раньше в этом же пакете)
+    result = await db.execute(
+        select(func.lower(User.email))
+        .where(func.lower(User.email).in_([user.email.lower() for user in rejected]))
+    )
+    taken_emails = set(result.scalars())
+    skipped = [
+        {
+            "email": user.email,
+            "nickname": user.nickname,
+            "detail": EMAIL_TAKEN if user.email.lower() in taken_emails else NICKNAME_TAKEN,
+        }
+        for user in rejected
+    ]
+    return created, skipped
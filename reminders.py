@@ -0,0 +1,366 @@
+import asyncio
+import heapq
+import json
+import os
+import urllib.request
+from datetime import datetime, timedelta, timezone
+from typing import Dict, List, Optional, Tuple
+from sqlalchemy import select, update, tuple_, or_
+from sqlalchemy.dialects.postgresql import insert
+from database import AsyncSessionLocal
+from models import Task, ReminderOutbox
+
+# Напоминания о дедлайнах.
+# Планировщик держит в памяти кучу ближайших напоминаний и подгружает задачи
+# порциями по диапазону дедлайнов (индекс ix_tasks_pending_deadline), а не опрашивает
+# всю таблицу. Сработавшие напоминания пишутся в outbox, откуда диспетчер пачками
+# отправляет их в sink: доставка "хотя бы один раз", дубликаты отсекаются по dedup_key.
+
+# За сколько минут до дедлайна напоминать
+REMINDER_LEAD = timedelta(minutes=int(os.getenv("REMINDER_LEAD_MINUTES", "60")))
+# На сколько вперёд держим напоминания в памяти
+REMINDER_HORIZON = timedelta(minutes=int(os.getenv("REMINDER_HORIZON_MINUTES", "60")))
+REMINDER_LOAD_PAGE = 1000
+REMINDER_BATCH_SIZE = int(os.getenv("REMINDER_BATCH_SIZE", "100"))
+REMINDER_DISPATCH_INTERVAL = float(os.getenv("REMINDER_DISPATCH_INTERVAL", "5"))
+REMINDER_MAX_ATTEMPTS = int(os.getenv("REMINDER_MAX_ATTEMPTS", "10"))
+# Срок аренды взятой на отправку пачки: с запасом больше таймаута sink
+REMINDER_CLAIM_LEASE = timedelta(seconds=int(os.getenv("REMINDER_CLAIM_LEASE_SECONDS", "60")))
+# Максимальный сон планировщика: заодно период подгрузки следующего диапазона
+REMINDER_TICK = 30.0
+
+def _now() -> datetime:
+    return datetime.now(timezone.utc)
+
+def _dedup_key(task_id: int, deadline_at: datetime) -> str:
+    return f"{task_id}:{int(deadline_at.timestamp())}"
+
+class FileSink:
+    """Дописывает напоминания в файл построчно (JSON Lines) — удобно для тестов"""
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def _write(self, lines: str) -> None:
+        with open(self.path, "a", encoding="utf-8") as file:
+            file.write(lines)
+
+    async def send(self, reminders: List[dict]) -> None:
+        lines = "".join(json.dumps(reminder, ensure_ascii=False) + "\n" for reminder in reminders)
+        await asyncio.to_thread(self._write, lines)
+
+class HttpSink:
+    """Отправляет пачку напоминаний POST-запросом (JSON); любой не-2xx ответ — ошибка"""
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    def _post(self, body: bytes) -> None:
+        request = urllib.request.Request(
+            self.url, data=body, method="POST", headers={"Content-Type": "application/json"}
+        )
+        with urllib.request.urlopen(request, timeout=self.timeout):
+            pass
+
+    async def send(self, reminders: List[dict]) -> None:
+        body = json.dumps({"reminders": reminders}, ensure_ascii=False).encode()
+        await asyncio.to_thread(self._post, body)
+
+class LogSink:
+    async def send(self, reminders: List[dict]) -> None:
+        for reminder in reminders:
+            print(f" Напоминание: задача {reminder['task_id']} «{reminder['title']}» — дедлайн {reminder['deadline_at']}")
+
+def sink_from_env():
+    # REMINDER_SINK: "http://..." / "https://...", "file:/путь/к/файлу" или пусто (вывод в лог)
+    target = os.getenv("REMINDER_SINK", "")
+    if target.startswith(("http://", "https://")):
+        return HttpSink(target)
+    if target.startswith("file:"):
+        return FileSink(target[len("file:"):])
+    return LogSink()
+
+class ReminderScheduler:
+    def __init__(self, session_factory=AsyncSessionLocal, sink=None, watch_changes: bool = False):
+        self.session_factory = session_factory
+        self.sink = sink
+        # Отдельный процесс не получает schedule() от обработчиков задач и поэтому
+        # перечитывает ближайший диапазон дедлайнов на каждом шаге; в процессе API
+        # куча обновляется обработчиками и лишних запросов к БД нет
+        self.watch_changes = watch_changes
+        # Куча (remind_at, task_id, deadline_at); устаревшие записи отбрасываются
+        # при извлечении по сверке с _entries (ленивое удаление)
+        self._heap: List[Tuple[datetime, int, datetime]] = []
+        self._entries: Dict[int, datetime] = {}
+        # Уже записанные в outbox напоминания (чтобы пересканирование не повторяло их)
+        self._fired: Dict[int, datetime] = {}
+        # Дедлайны до этого момента уже загружены в память
+        self._loaded_until: Optional[datetime] = None
+        self._wakeup = asyncio.Event()
+        self._dispatch_wakeup = asyncio.Event()
+        self._tasks: List[asyncio.Task] = []
+
+    # Обновления из обработчиков задач (create / update / complete / delete)
+
+    def schedule(self, task: Task) -> None:
+        # Просроченные дедлайны не напоминаем (как и при загрузке диапазона)
+        if task.completed or task.deadline_at is None or task.recurrence_rule or task.deadline_at <= _now():
+            self.unschedule(task.id)
+            return
+        # Дальние дедлайны подхватит загрузка следующего диапазона
+        if self._loaded_until is None or task.deadline_at >= self._loaded_until:
+            self._entries.pop(task.id, None)
+            return
+        self._push(task.id, task.deadline_at)
+        self._wakeup.set()
+
+    def unschedule(self, task_id: int) -> None:
+        self._entries.pop(task_id, None)
+
+    def _push(self, task_id: int, deadline_at: datetime) -> None:
+        if self._entries.get(task_id) == deadline_at or self._fired.get(task_id) == deadline_at:
+            return
+        self._entries[task_id] = deadline_at
+        heapq.heappush(self._heap, (deadline_at - REMINDER_LEAD, task_id, deadline_at))
+
+    # Загрузка диапазона дедлайнов
+
+    async def _load_range(self, start: datetime, until: datetime) -> None:
+        cursor = None
+        async with self.session_factory() as session:
+            while True:
+                query = (
+                    select(Task.id, Task.deadline_at)
+                    .where(
+                        Task.completed == False,
+                        Task.deadline_at.isnot(None),
+                        Task.recurrence_rule.is_(None),
+                        Task.deadline_at >= start,
+                        Task.deadline_at < until
+                    )
+                    .order_by(Task.deadline_at, Task.id)
+                    .limit(REMINDER_LOAD_PAGE)
+                )
+                if cursor is not None:
+                    query = query.where(tuple_(Task.deadline_at, Task.id) > cursor)
+                rows = (await session.execute(query)).all()
+                for task_id, deadline_at in rows:
+                    self._push(task_id, deadline_at)
+                if len(rows) < REMINDER_LOAD_PAGE:
+                    break
+                cursor = tuple(rows[-1])
+
+    async def _load_until(self, until: datetime) -> None:
+        start = self._loaded_until or _now()
+        if until <= start:
+            return
+        await self._load_range(start, until)
+        self._loaded_until = until
+
+    # Срабатывание: запись в outbox
+
+    def _pop_due(self, now: datetime) -> List[Tuple[int, datetime]]:
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, task_id, deadline_at = heapq.heappop(self._heap)
+            if self._entries.get(task_id) == deadline_at:
+                del self._entries[task_id]
+                due.append((task_id, deadline_at))
+        return due
+
+    async def _fire(self, due: List[Tuple[int, datetime]]) -> None:
+        # Планировщик мог проспать дедлайн (остановка, ошибки БД) — такие уже не отправляем
+        now = _now()
+        due = [(task_id, deadline_at) for task_id, deadline_at in due if deadline_at > now]
+        if not due:
+            return
+        async with self.session_factory() as session:
+            # Сверяемся с БД: задачу могли изменить или выполнить в другом процессе
+            result = await session.execute(
+                select(Task.id, Task.user_id, Task.title, Task.deadline_at).where(
+                    Task.id.in_([task_id for task_id, _ in due]),
+                    Task.completed == False
+                )
+            )
+            expected = dict(due)
+            found = result.all()
+            rows = [
+                {
+                    "task_id": task_id,
+                    "user_id": user_id,
+                    "title": title[:100],
+                    "deadline_at": deadline_at,
+                    "remind_at": deadline_at - REMINDER_LEAD,
+                    "dedup_key": _dedup_key(task_id, deadline_at),
+                }
+                for task_id, user_id, title, deadline_at in found
+                if expected.get(task_id) == deadline_at and deadline_at > now
+            ]
+            # Дедлайн сдвинули в другом процессе — ставим напоминание на новое время
+            for task_id, _, _, deadline_at in found:
+                if deadline_at is not None and expected.get(task_id) != deadline_at and deadline_at > now:
+                    self._push(task_id, deadline_at)
+            if rows:
+                await session.execute(
+                    insert(ReminderOutbox).values(rows).on_conflict_do_nothing(index_elements=["dedup_key"])
+                )
+                await session.commit()
+                self._dispatch_wakeup.set()
+            for row in rows:
+                self._fired[row["task_id"]] = row["deadline_at"]
+
+    async def _run_scheduler(self) -> None:
+        while True:
+            try:
+                now = _now()
+                await self._load_until(now + REMINDER_LEAD + REMINDER_HORIZON)
+                if self.watch_changes:
+                    # Короткий диапазон ближайших дедлайнов перечитываем на каждом шаге:
+                    # так видны задачи, созданные или изменённые процессами API
+                    await self._load_range(now, now + REMINDER_LEAD + timedelta(seconds=REMINDER_TICK))
+                self._fired = {
+                    task_id: deadline_at for task_id, deadline_at in self._fired.items() if deadline_at > now
+                }
+                due = self._pop_due(now)
+                if due:
+                    try:
+                        await self._fire(due)
+                    except Exception:
+                        # Вернём в кучу и попробуем на следующем шаге
+                        for task_id, deadline_at in due:
+                            self._entries.setdefault(task_id, deadline_at)
+                            heapq.heappush(self._heap, (deadline_at - REMINDER_LEAD, task_id, deadline_at))
+                        raise
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                print(f" Планировщик напоминаний: ошибка {error!r}")
+
+            timeout = REMINDER_TICK
+            if self._heap:
+                timeout = min(timeout, max((self._heap[0][0] - _now()).total_seconds(), 0))
+            self._wakeup.clear()
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    # Диспетчер: outbox -> sink
+
+    async def _claim_batch(self) -> List[dict]:
+        # Короткая транзакция: берём пачку в аренду (claimed_until) и сразу коммитим,
+        # чтобы соединение не висело "idle in transaction" на время отправки.
+        # SKIP LOCKED: несколько воркеров не возьмут одну и ту же запись
+        now = _now()
+        claimable = (
+            select(ReminderOutbox.id)
+            .where(
+                ReminderOutbox.dispatched_at.is_(None),
+                ReminderOutbox.attempts < REMINDER_MAX_ATTEMPTS,
+                or_(ReminderOutbox.claimed_until.is_(None), ReminderOutbox.claimed_until < now)
+            )
+            .order_by(ReminderOutbox.id)
+            .limit(REMINDER_BATCH_SIZE)
+            .with_for_update(skip_locked=True)
+        )
+        async with self.session_factory() as session:
+            result = await session.execute(
+                update(ReminderOutbox)
+                .where(ReminderOutbox.id.in_(claimable))
+                .values(claimed_until=now + REMINDER_CLAIM_LEASE, attempts=ReminderOutbox.attempts + 1)
+                .returning(
+                    ReminderOutbox.id, ReminderOutbox.dedup_key, ReminderOutbox.task_id,
+                    ReminderOutbox.user_id, ReminderOutbox.title,
+                    ReminderOutbox.deadline_at, ReminderOutbox.remind_at
+                )
+                .execution_options(synchronize_session=False)
+            )
+            rows = sorted(result.all(), key=lambda row: row.id)
+            await session.commit()
+        return [
+            {
+                "id": row.id,
+                "dedup_key": row.dedup_key,
+                "task_id": row.task_id,
+                "user_id": row.user_id,
+                "title": row.title,
+                "deadline_at": row.deadline_at.isoformat(),
+                "remind_at": row.remind_at.isoformat(),
+            }
+            for row in rows
+        ]
+
+    async def _finish_batch(self, ids: List[int], sent: bool) -> None:
+        # Вторая короткая транзакция: отмечаем отправку или снимаем аренду для повтора
+        values = {"dispatched_at": _now()} if sent else {"claimed_until": None}
+        async with self.session_factory() as session:
+            await session.execute(
+                update(ReminderOutbox)
+                .where(ReminderOutbox.id.in_(ids))
+                .values(**values)
+                .execution_options(synchronize_session=False)
+            )
+            await session.commit()
+
+    async def dispatch_batch(self) -> int:
+        batch = await self._claim_batch()
+        if not batch:
+            return 0
+        ids = [item.pop("id") for item in batch]
+        try:
+            await self.sink.send(batch)
+        except Exception as error:
+            print(f" Отправка напоминаний не удалась: {error!r}")
+            await self._finish_batch(ids, sent=False)
+            raise
+        # Если процесс упадёт до этой отметки, пачка уйдёт повторно после истечения аренды
+        # (доставка "хотя бы один раз", получатель отсекает дубликаты по dedup_key)
+        await self._finish_batch(ids, sent=True)
+        return len(batch)
+
+    async def _run_dispatcher(self) -> None:
+        while True:
+            try:
+                # Пока пачки полные — отправляем без паузы
+                while await self.dispatch_batch() == REMINDER_BATCH_SIZE:
+                    pass
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                print(f" Диспетчер напоминаний: ошибка {error!r}")
+            self._dispatch_wakeup.clear()
+            try:
+                await asyncio.wait_for(self._dispatch_wakeup.wait(), REMINDER_DISPATCH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+    async def start(self) -> None:
+        if self.sink is None:
+            self.sink = sink_from_env()
+        self._tasks = [
+            asyncio.create_task(self._run_scheduler()),
+            asyncio.create_task(self._run_dispatcher()),
+        ]
+
+    async def stop(self) -> None:
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+reminder_scheduler = ReminderScheduler()
+
+async def run_worker() -> None:
+    # Отдельный процесс: python reminders.py (в main.py тогда REMINDER_SCHEDULER=off).
+    # Нужен и при нескольких воркерах API: встроенный планировщик видит только свои изменения
+    reminder_scheduler.watch_changes = True
+    await reminder_scheduler.start()
+    print(" Планировщик напоминаний запущен")
+    try:
+        await asyncio.Event().wait()
+    finally:
+        await reminder_scheduler.stop()
+
+if __name__ == "__main__":
+    asyncio.run(run_worker())
@@ -1,30 +1,154 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
+from fastapi.responses import StreamingResponse
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select, func
-from models import User, Task
-from database import get_async_session
+from sqlalchemy import select, func, or_, tuple_
+from models import User
+from database import get_async_session, AsyncSessionLocal
 from dependencies import get_current_admin
-from typing import List
+from schemas_auth import UserBulkCreate, UserBulkResult
+from registration import register_users_bulk
+from profiling import profile_store, PROFILING_ENABLED
+from typing import Dict, List, Literal, Optional
+import json
 
 router = APIRouter(prefix="/admin", tags=["admin"])
 
+def _user_row_to_dict(row) -> dict:
+    return {
+        "id": row.id,
+        "nickname": row.nickname,
+        "email": row.email,
+        "role": row.role.value,
+        "task_count": row.task_count
+    }
+
+def _prefix_pattern(q: str) -> str:
+    # Экранируем спецсимволы LIKE, чтобы префикс оставался "левым якорем" для индекса
+    escaped = q.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return escaped + "%"
+
+def _parse_cursor(cursor: str, sort: str):
+    try:
+        if sort == "task_count":
+            task_count, user_id = cursor.split(":")
+            return int(task_count), int(user_id)
+        return int(cursor)
+    except ValueError:
+        raise HTTPException(status_code=400, detail="Неверный курсор")
+
+def _users_query(q: Optional[str], sort: str):
+    # Только нужные колонки, без JOIN с задачами: число задач хранится в users.task_count
+    query = select(User.id, User.nickname, User.email, User.role, User.task_count)
+    if q:
+        pattern = _prefix_pattern(q)
+        query = query.where(or_(
+            func.lower(User.nickname).like(pattern),
+            func.lower(User.email).like(pattern)
+        ))
+    if sort == "task_count":
+        return query.order_by(User.task_count.desc(), User.id.desc())
+    return query.order_by(User.id)
+
+async def _stream_users_ndjson(q: Optional[str], sort: str):
+    # Отдельная сессия и серверный курсор: в памяти держится только одна порция строк
+    async with AsyncSessionLocal() as session:
+        result = await session.stream(
+            _users_query(q, sort).execution_options(yield_per=1000)
+        )
+        # Отдаём строки пачками: меньше мелких чанков и лучше сжатие при потоковой передаче
+        async for rows in result.partitions():
+            yield "".join(json.dumps(_user_row_to_dict(row), ensure_ascii=False) + "\n" for row in rows)
+
 @router.get("/users", response_model=List[dict])
 async def get_all_users_with_task_count(
+    response: Response,
+    cursor: Optional[str] = Query(None, description="Значение X-Next-Cursor из предыдущей страницы"),
+    limit: int = Query(100, ge=1, le=1000),
+    q: Optional[str] = Query(None, min_length=1, max_length=100, description="Префикс никнейма или email"),
+    sort: Literal["id", "task_count"] = Query("id"),
+    format: Literal["json", "ndjson"] = Query("json", description="ndjson — потоковая выгрузка всех пользователей"),
+    db: AsyncSession = Depends(get_async_session),
+    admin: User = Depends(get_current_admin)
+):
+    if format == "ndjson":
+        return StreamingResponse(_stream_users_ndjson(q, sort), media_type="application/x-ndjson")
+
+    query = _users_query(q, sort)
+    if cursor is not None:
+        position = _parse_cursor(cursor, sort)
+        if sort == "task_count":
+            query = query.where(tuple_(User.task_count, User.id) < position)
+        else:
+            query = query.where(User.id > position)
+
+    result = await db.execute(query.limit(limit))
+    rows = result.all()
+    # Курсор следующей страницы передаём в заголовке, тело остаётся списком
+    if len(rows) == limit:
+        last = rows[-1]
+        response.headers["X-Next-Cursor"] = (
+            f"{last.task_count}:{last.id}" if sort == "task_count" else str(last.id)
+        )
+    return [_user_row_to_dict(row) for row in rows]
+
+@router.post("/users/bulk", response_model=UserBulkResult,
+            status_code=status.HTTP_201_CREATED) # Массовое создание пользователей
+async def create_users_bulk(
+    payload: UserBulkCreate,
     db: AsyncSession = Depends(get_async_session),
     admin: User = Depends(get_current_admin)
 ):
-    result = await db.execute(
-        select(User, func.count(Task.id).label("task_count"))
-        .outerjoin(Task)
-        .group_by(User.id)
-    )
-    return [
-        {
-            "id": user.id,
-            "nickname": user.nickname,
-            "email": user.email,
-            "role": user.role.value,
-            "task_count": task_count
-        }
-        for user, task_count in result
-    ]
\ No newline at end of file
+    # Тот же путь, что и при регистрации: один INSERT ... ON CONFLICT DO NOTHING
+    created, skipped = await register_users_bulk(db, payload.users)
+    return {
+        "created": [
+            {
+                "id": user.id,
+                "nickname": user.nickname,
+                "email": user.email,
+                "role": user.role.value
+            }
+            for user in created
+        ],
+        "skipped": skipped
+    }
+
+def _require_profiling():
+    if not PROFILING_ENABLED:
+        raise HTTPException(status_code=404, detail="Профилирование выключено (PROFILING_ENABLED=1)")
+
+@router.get("/profiles", response_model=List[dict]) # Последние профили запросов
+async def get_profiles(
+    admin: User = Depends(get_current_admin)
+):
+    _require_profiling()
+    return profile_store.list()
+
+@router.get("/profiles/{profile_id}") # Профиль в формате speedscope
+async def get_profile(
+    profile_id: int,
+    admin: User = Depends(get_current_admin)
+):
+    _require_profiling()
+    item = profile_store.get(profile_id)
+    if item is None:
+        raise HTTPException(status_code=404, detail="Профиль не найден (буфер хранит только последние)")
+    return item["profile"]
+
+@router.get("/profiling/sampling", response_model=Dict[str, float])
+async def get_profiling_sampling(
+    admin: User = Depends(get_current_admin)
+):
+    _require_profiling()
+    return profile_store.sample_rates
+
+@router.put("/profiling/sampling", response_model=Dict[str, float]) # Доли фонового семплирования по префиксам пути
+async def set_profiling_sampling(
+    rates: Dict[str, float],
+    admin: User = Depends(get_current_admin)
+):
+    _require_profiling()
+    if any(not 0 <= rate <= 1 for rate in rates.values()):
+        raise HTTPException(status_code=400, detail="Доля семплирования должна быть от 0 до 1")
+    profile_store.sample_rates = {prefix: rate for prefix, rate in rates.items() if rate > 0}
+    return profile_store.sample_rates
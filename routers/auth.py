@@ -1,12 +1,14 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
+from sqlalchemy import select, func
 from database import get_async_session
-from models import User, UserRole
+from models import User
 from schemas_auth import UserCreate, UserResponse, Token
-from auth_utils import verify_password, get_password_hash, create_access_token
-from dependencies import get_current_user
+from auth_utils import verify_password, get_password_hash, create_access_token, decode_access_token, token_cache
+from dependencies import get_current_user, oauth2_scheme
+from token_revocation import revocation_list
+from registration import register_user
 
 router = APIRouter(
     prefix="/auth",
@@ -18,48 +20,17 @@ async def register(
     user_data: UserCreate,
     db: AsyncSession = Depends(get_async_session)
 ):
-    # Проверяем, не занят ли email
-    result = await db.execute(
-        select(User).where(User.email == user_data.email)
-    )
-    if result.scalar_one_or_none():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Пользователь с таким email уже существует"
-    )
-
-    # Проверяем, не занят ли nickname
-    result = await db.execute(
-        select(User).where(User.nickname == user_data.nickname)
-    )
-    if result.scalar_one_or_none():
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Пользователь с таким никнеймом уже существует"
-    )
-
-    # Создаем нового пользователя
-    new_user = User(
-        nickname=user_data.nickname,
-        email=user_data.email,
-        hashed_password=get_password_hash(user_data.password),
-        role=UserRole.USER # По умолчанию обычный пользователь
-    )
-
-    db.add(new_user)
-    await db.commit()
-    await db.refresh(new_user)
-
-    return new_user
+    # Проверка уникальности, хеширование пароля и вставка — см. registration.py
+    return await register_user(db, user_data)
 
 @router.post("/login", response_model=Token)
 async def login(
     form_data: OAuth2PasswordRequestForm = Depends(),
     db: AsyncSession = Depends(get_async_session)
 ):
-    # Ищем пользователя по email (username в форме = email)
+    # Ищем пользователя по email (username в форме = email), без учёта регистра
     result = await db.execute(
-        select(User).where(User.email == form_data.username)
+        select(User).where(func.lower(User.email) == form_data.username.lower())
     )
     user = result.scalar_one_or_none()
 
@@ -73,7 +44,7 @@ async def login(
 
     # Создаем JWT токен
     access_token = create_access_token(
-        data={"sub": str(user.id), "role": user.role.value}
+        data={"sub": str(user.id), "role": user.role.value, "epoch": user.token_epoch}
     )
 
     return {"access_token": access_token, "token_type": "bearer"}
@@ -97,5 +68,34 @@ async def change_password(
         raise HTTPException(status_code=400, detail="Новый пароль должен быть не менее 6 символов")
     
     current_user.hashed_password = get_password_hash(new_password)
+    # Смена пароля отзывает все ранее выданные токены
+    current_user.token_epoch += 1
+    await db.commit()
+    return {"message": "Пароль успешно изменён"}
+
+@router.post("/logout") # Отзыв текущего токена
+async def logout(
+    token: str = Depends(oauth2_scheme),
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session)
+):
+    payload = decode_access_token(token)
+    jti = payload.get("jti")
+    if jti is None:
+        # Старые токены без jti можно отозвать только через logout-all
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Токен не поддерживает отзыв, используйте выход со всех устройств"
+        )
+    await revocation_list.revoke(db, jti, current_user.id, payload["exp"])
+    token_cache.discard(token)
+    return {"message": "Выход выполнен"}
+
+@router.post("/logout-all") # Отзыв всех токенов пользователя
+async def logout_all(
+    current_user: User = Depends(get_current_user),
+    db: AsyncSession = Depends(get_async_session)
+):
+    current_user.token_epoch += 1
     await db.commit()
-    return {"message": "Пароль успешно изменён"}
\ No newline at end of file
+    return {"message": "Выход выполнен на всех устройствах"}
\ No newline at end of file
@@ -1,10 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Query, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, case
 from models import Task, User
 from models.user import UserRole
 from database import get_async_session
-from dependencies import get_current_user
+from dependencies import get_current_user, get_current_user_for_read
+from recurrence import resolve_window, expand_occurrences
+from circuit_breaker import DatabaseUnavailable, stale_cache
+from datetime import datetime
+from typing import Optional
 
 
 router = APIRouter(
@@ -14,14 +18,20 @@ router = APIRouter(
 
 @router.get("/", response_model=dict)
 async def get_tasks_stats(
+    response: Response,
     db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_for_read)
 ) -> dict:
+    cache_key = ("stats", current_user.id)
     query = select(Task)
     if current_user.role != UserRole.ADMIN:
         query = query.where(Task.user_id == current_user.id)
 
-    result = await db.execute(query)
+    try:
+        result = await db.execute(query)
+    except DatabaseUnavailable as error:
+        # БД недоступна — отдаём последнюю удачную статистику с пометкой X-Stale
+        return stale_cache.serve(response, cache_key, error)
     tasks = result.scalars().all()
 
     total_tasks = len(tasks)
@@ -35,23 +45,35 @@ async def get_tasks_stats(
         else:
             by_status["pending"] += 1
 
-    return {
+    stats = {
         "total_tasks": total_tasks,
         "by_quadrant": by_quadrant,
         "by_status": by_status
     }
+    stale_cache.put(cache_key, stats)
+    return stats
 
 @router.get("/deadlines", response_model=dict)
 async def get_pending_tasks_with_deadlines(
+    occurrences_from: Optional[datetime] = Query(None, description="Начало окна для повторяющихся задач (по умолчанию — сегодня)"),
+    occurrences_to: Optional[datetime] = Query(None, description="Конец окна (по умолчанию — через 30 дней)"),
     db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user)
 ) -> dict:
-    query = select(Task).where(Task.completed == False, Task.deadline_at.isnot(None))
+    start, end = resolve_window(occurrences_from, occurrences_to)
+    query = select(Task).where(
+        Task.completed == False,
+        Task.deadline_at.isnot(None),
+        Task.recurrence_rule.is_(None)
+    )
     if current_user.role != UserRole.ADMIN:
         query = query.where(Task.user_id == current_user.id)
 
     result = await db.execute(query)
-    tasks = result.scalars().all()
+    tasks = list(result.scalars().all())
+    # Повторения серий в окне — вычисляются, а не читаются из таблицы
+    user_id = None if current_user.role == UserRole.ADMIN else current_user.id
+    tasks.extend(await expand_occurrences(db, start, end, user_id))
 
     pending_with_deadlines = []
     for task in tasks:
@@ -61,7 +83,10 @@ async def get_pending_tasks_with_deadlines(
             "title": task.title,
             "description": task.description,
             "deadline_at": task.deadline_at,
-            "days_until_deadline": (task.deadline_at - task.created_at).days if task.deadline_at else None
+            "days_until_deadline": (task.deadline_at - task.created_at).days if task.deadline_at else None,
+            # Несохранённое повторение (id = null) адресуется парой series_id + occurrence_at
+            "series_id": task.series_id,
+            "occurrence_at": task.occurrence_at
         })
 
     return {
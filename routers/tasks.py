@@ -1,13 +1,19 @@
-from fastapi import APIRouter, HTTPException, Query, Depends, status
+from fastapi import APIRouter, HTTPException, Query, Depends, Response, status
 from sqlalchemy.ext.asyncio import AsyncSession
-from sqlalchemy import select
-from typing import List
-from datetime import datetime, date
+from sqlalchemy import select, Date
+from typing import List, Optional
+from datetime import datetime, date, timedelta, timezone
 from models import Task, User
 from models.user import UserRole
 from schemas import TaskCreate, TaskUpdate, TaskResponse
 from database import get_async_session
-from dependencies import get_current_user
+from dependencies import get_current_user, get_current_user_for_read
+from recurrence import (
+    RecurrenceRule, compute_quadrant, is_urgent_at, resolve_window,
+    expand_occurrences, first_free_occurrence, materialize_occurrence, as_utc
+)
+from reminders import reminder_scheduler
+from circuit_breaker import DatabaseUnavailable, stale_cache
 
 router = APIRouter(
     tags=["tasks"],
@@ -17,24 +23,45 @@ router = APIRouter(
 # GET ALL TASKS
 @router.get("", response_model=List[TaskResponse])
 async def get_all_tasks(
+    response: Response,
+    occurrences_from: Optional[datetime] = Query(None, description="Начало окна для повторяющихся задач (по умолчанию — сегодня)"),
+    occurrences_to: Optional[datetime] = Query(None, description="Конец окна (по умолчанию — через 30 дней)"),
     db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_for_read)
 ) -> List[TaskResponse]:
-    if current_user.role == UserRole.ADMIN:
-        result = await db.execute(select(Task))
-    else:
-        result = await db.execute(select(Task).where(Task.user_id == current_user.id))
-    tasks = result.scalars().all()
+    start, end = resolve_window(occurrences_from, occurrences_to)
+    cache_key = ("tasks", current_user.id, occurrences_from, occurrences_to)
+    try:
+        # Сами серии не выводим — вместо них повторения в запрошенном окне
+        query = select(Task).where(Task.recurrence_rule.is_(None))
+        if current_user.role != UserRole.ADMIN:
+            query = query.where(Task.user_id == current_user.id)
+        result = await db.execute(query)
+        tasks = list(result.scalars().all())
+
+        user_id = None if current_user.role == UserRole.ADMIN else current_user.id
+        tasks.extend(await expand_occurrences(db, start, end, user_id))
+    except DatabaseUnavailable as error:
+        # БД недоступна — отдаём последний удачный ответ с пометкой X-Stale
+        return stale_cache.serve(response, cache_key, error)
+    # Список администратора — все задачи системы: его не кешируем
+    if current_user.role != UserRole.ADMIN:
+        stale_cache.put(cache_key, tasks, weight=len(tasks))
     return tasks
 
 # GET TASK BY ID
-@router.get("/{task_id}", response_model=TaskResponse)
+@router.get("/{task_id:int}", response_model=TaskResponse)
 async def get_task_by_id(
     task_id: int,
+    response: Response,
     db: AsyncSession = Depends(get_async_session),
-    current_user: User = Depends(get_current_user)
+    current_user: User = Depends(get_current_user_for_read)
 ) -> TaskResponse:
-    result = await db.execute(select(Task).where(Task.id == task_id))
+    cache_key = ("task", current_user.id, task_id)
+    try:
+        result = await db.execute(select(Task).where(Task.id == task_id))
+    except DatabaseUnavailable as error:
+        return stale_cache.serve(response, cache_key, error)
     task = result.scalar_one_or_none()
     if not task:
         raise HTTPException(status_code=404, detail="Задача не найдена")
@@ -43,6 +70,7 @@ async def get_task_by_id(
     if current_user.role != UserRole.ADMIN and task.user_id != current_user.id:
         raise HTTPException(status_code=403, detail="Недостаточно прав для доступа к этой задаче")
     
+    stale_cache.put(cache_key, task)
     return task
 
 # GET TASKS BY QUADRANT
@@ -108,13 +136,20 @@ async def get_tasks_due_today(
     today = datetime.utcnow().date()
     query = select(Task).where(
         Task.deadline_at.cast(Date) == today,
-        Task.completed == False
+        Task.completed == False,
+        Task.recurrence_rule.is_(None)
     )
     if current_user.role != UserRole.ADMIN:
         query = query.where(Task.user_id == current_user.id)
     
     result = await db.execute(query)
-    return result.scalars().all()
+    tasks = list(result.scalars().all())
+
+    # Повторения серий, приходящиеся на сегодня
+    start = datetime(today.year, today.month, today.day, tzinfo=timezone.utc)
+    user_id = None if current_user.role == UserRole.ADMIN else current_user.id
+    tasks.extend(await expand_occurrences(db, start, start + timedelta(days=1), user_id))
+    return tasks
 
 # CREATE TASK
 @router.post("/", response_model=TaskResponse, status_code=status.HTTP_201_CREATED)
@@ -123,28 +158,33 @@ async def create_task(
     db: AsyncSession = Depends(get_async_session),
     current_user: User = Depends(get_current_user)
 ) -> TaskResponse:
-    # Определяем квадрант
-    if task.is_important and task.is_urgent:
-        quadrant = "Q1"
-    elif task.is_important and not task.is_urgent:
-        quadrant = "Q2"
-    elif not task.is_important and task.is_urgent:
-        quadrant = "Q3"
-    else:
-        quadrant = "Q4"
+    # Определяем квадрант (срочность рассчитывается по дедлайну)
+    quadrant = compute_quadrant(task.is_important, is_urgent_at(task.deadline_at))
 
     new_task = Task(
         title=task.title,
         description=task.description,
         is_important=task.is_important,
-        is_urgent=task.is_urgent,
         quadrant=quadrant,
         completed=False,
+        deadline_at=task.deadline_at,
         user_id=current_user.id  # ← привязка к пользователю
     )
+
+    # Повторяющаяся задача: храним одну серию, повторения вычисляются при чтении
+    if task.recurrence_rule:
+        if task.deadline_at is None:
+            raise HTTPException(status_code=400, detail="Для повторяющейся задачи нужен дедлайн первого повторения")
+        rule = RecurrenceRule.parse(task.recurrence_rule)
+        new_task.recurrence_rule = task.recurrence_rule
+        new_task.next_occurrence_at = rule.first(task.deadline_at)
+        new_task.last_occurrence_at = rule.last(task.deadline_at)
+        if new_task.next_occurrence_at is None:
+            raise HTTPException(status_code=400, detail="Правило повторения не даёт ни одного повторения")
     db.add(new_task)
     await db.commit()
     await db.refresh(new_task)
+    reminder_scheduler.schedule(new_task)
     return new_task
 
 # UPDATE TASK
@@ -164,21 +204,30 @@ async def update_task(
         raise HTTPException(status_code=403, detail="Недостаточно прав для редактирования этой задачи")
 
     update_data = task_update.model_dump(exclude_unset=True)
+    if "recurrence_rule" in update_data and not task.recurrence_rule:
+        raise HTTPException(status_code=400, detail="Правило повторения можно менять только у серии")
     for field, value in update_data.items():
         setattr(task, field, value)
 
-    if "is_important" in update_data or "is_urgent" in update_data:
-        if task.is_important and task.is_urgent:
-            task.quadrant = "Q1"
-        elif task.is_important and not task.is_urgent:
-            task.quadrant = "Q2"
-        elif not task.is_important and task.is_urgent:
-            task.quadrant = "Q3"
-        else:
-            task.quadrant = "Q4"
+    if "is_important" in update_data or "deadline_at" in update_data:
+        task.quadrant = compute_quadrant(task.is_important, is_urgent_at(task.deadline_at))
+
+    # Правило убрали — серия становится обычной задачей
+    if "recurrence_rule" in update_data and not task.recurrence_rule:
+        task.next_occurrence_at = None
+        task.last_occurrence_at = None
+
+    # Изменилось расписание серии — пересчитываем ближайшее повторение (с сегодняшнего дня)
+    if task.recurrence_rule and ("recurrence_rule" in update_data or "deadline_at" in update_data):
+        if task.deadline_at is None:
+            raise HTTPException(status_code=400, detail="Для повторяющейся задачи нужен дедлайн первого повторения")
+        start, _ = resolve_window(None, None)
+        task.next_occurrence_at = await first_free_occurrence(db, task, max(start, as_utc(task.deadline_at)))
+        task.last_occurrence_at = RecurrenceRule.parse(task.recurrence_rule).last(task.deadline_at)
 
     await db.commit()
     await db.refresh(task)
+    reminder_scheduler.schedule(task)
     return task
 
 # COMPLETE TASK
@@ -200,6 +249,48 @@ async def complete_task(
     task.completed_at = datetime.now()
     await db.commit()
     await db.refresh(task)
+    reminder_scheduler.schedule(task)
+    return task
+
+# Повторение серии сохраняется отдельной задачей только при выполнении или редактировании
+async def _get_own_series(db: AsyncSession, task_id: int, current_user: User) -> Task:
+    result = await db.execute(select(Task).where(Task.id == task_id))
+    series = result.scalar_one_or_none()
+    if not series:
+        raise HTTPException(status_code=404, detail="Задача не найдена")
+    if current_user.role != UserRole.ADMIN and series.user_id != current_user.id:
+        raise HTTPException(status_code=403, detail="Недостаточно прав")
+    return series
+
+# COMPLETE OCCURRENCE
+@router.patch("/{task_id}/occurrences/{occurrence_at}/complete", response_model=TaskResponse)
+async def complete_occurrence(
+    task_id: int,
+    occurrence_at: datetime,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> TaskResponse:
+    series = await _get_own_series(db, task_id, current_user)
+    return await materialize_occurrence(db, series, occurrence_at, {
+        "completed": True,
+        "completed_at": datetime.now(timezone.utc)
+    })
+
+# UPDATE OCCURRENCE
+@router.put("/{task_id}/occurrences/{occurrence_at}", response_model=TaskResponse)
+async def update_occurrence(
+    task_id: int,
+    occurrence_at: datetime,
+    task_update: TaskUpdate,
+    db: AsyncSession = Depends(get_async_session),
+    current_user: User = Depends(get_current_user)
+) -> TaskResponse:
+    series = await _get_own_series(db, task_id, current_user)
+    update_data = task_update.model_dump(exclude_unset=True)
+    if "recurrence_rule" in update_data:
+        raise HTTPException(status_code=400, detail="Правило повторения меняется у серии, а не у отдельного повторения")
+    task = await materialize_occurrence(db, series, occurrence_at, update_data)
+    reminder_scheduler.schedule(task)
     return task
 
 # DELETE TASK
@@ -219,4 +310,5 @@ async def delete_task(
 
     await db.delete(task)
     await db.commit()
+    reminder_scheduler.unschedule(task_id)
     return {"message": "Задача удалена", "id": task_id}
\ No newline at end of file
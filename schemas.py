@@ -1,6 +1,13 @@
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, field_validator
 from typing import Optional
 from datetime import datetime
+from recurrence_rule import RecurrenceRule
+
+def _normalize_rule(value: Optional[str]) -> Optional[str]:
+    # Проверяем правило повторения и приводим к каноническому виду
+    if value is None:
+        return None
+    return str(RecurrenceRule.parse(value))
 
 # Базовая схема для Task.
 # Все поля, которые есть в нашей "базе данных" tasks_db
@@ -10,6 +17,14 @@ class TaskBase(BaseModel):
     is_important: bool = Field(..., description="Важность задачи")
     # is_urgent убираем — теперь расчётное поле
     deadline_at: Optional[datetime] = Field(None, description="Плановая дата завершения задачи")
+    recurrence_rule: Optional[str] = Field(
+        None,
+        max_length=200,
+        description="Правило повторения в стиле RRULE, например FREQ=WEEKLY;BYDAY=MO,WE",
+        examples=["FREQ=DAILY;INTERVAL=2"]
+    )
+
+    check_recurrence_rule = field_validator("recurrence_rule")(_normalize_rule)
 
 # Схема для создания новой задачи
 # Наследует все поля от TaskBase
@@ -25,12 +40,16 @@ class TaskUpdate(BaseModel):
     deadline_at: Optional[datetime] = Field(None, description="Новый дедлайн")
     # is_urgent не включаем — он рассчитывается
     completed: Optional[bool] = Field(None, description="Статус выполнения")
+    recurrence_rule: Optional[str] = Field(None, max_length=200, description="Новое правило повторения (только для серий)")
+
+    check_recurrence_rule = field_validator("recurrence_rule")(_normalize_rule)
 
 # Модель для ответа (TaskResponse)
 # При ответе сервер возвращает полную информацию о задаче,
 # включая сгенерированные поля: id, quadrant, created_at, etc.
 class TaskResponse(TaskBase):
-    id: int = Field(..., description="Уникальный идентификатор задачи", examples=[1])
+    # null у несохранённого повторения серии: оно адресуется как /{series_id}/occurrences/{occurrence_at}
+    id: Optional[int] = Field(..., description="Уникальный идентификатор задачи", examples=[1])
     quadrant: str = Field(..., description="Квадрант матрицы Эйзенхауэра (Q1, Q2, Q3, Q4)", examples=["Q1"])
     completed: bool = Field(default=False, description="Статус выполнения задачи")
     created_at: datetime = Field(..., description="Дата и время создания задачи")
@@ -38,6 +57,9 @@ class TaskResponse(TaskBase):
     deadline_at: Optional[datetime] = Field(None, description="Плановая дата завершения задачи")
     is_urgent: bool = Field(..., description="Рассчитанная срочность задачи")  # Добавлено
     days_until_deadline: Optional[int] = Field(None, description="Количество дней до дедлайна (отрицательное — если просрочено)")  # Добавлено
+    # Для повторений: id серии и исходное время повторения
+    series_id: Optional[int] = Field(None, description="Серия, к которой относится повторение")
+    occurrence_at: Optional[datetime] = Field(None, description="Время повторения в серии")
 
     class Config:
         from_attributes = True
\ No newline at end of file
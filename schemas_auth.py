@@ -1,5 +1,5 @@
 from pydantic import BaseModel, Field, EmailStr
-from typing import Optional
+from typing import Optional, List
 from models.user import UserRole
 # Схема регистрации нового пользователя
 class UserCreate(BaseModel):
@@ -39,3 +39,20 @@ class Token(BaseModel):
 class TokenData(BaseModel):
     user_id: Optional[int] = None
     role: Optional[str] = None
+# Схема массового создания пользователей администратором
+class UserBulkCreate(BaseModel):
+    users: List[UserCreate] = Field(
+        ...,
+        min_length=1,
+        max_length=500,
+        description="Список пользователей (не более 500 за запрос)"
+    )
+# Пользователь, пропущенный при массовом создании
+class UserBulkSkipped(BaseModel):
+    email: str
+    nickname: str
+    detail: str
+# Результат массового создания
+class UserBulkResult(BaseModel):
+    created: List[UserResponse]
+    skipped: List[UserBulkSkipped]
@@ -0,0 +1,152 @@
+from datetime import datetime, timezone
+import pytest
+from recurrence_rule import RecurrenceRule
+
+# Тесты правил повторения: чистая логика, БД не нужна.
+# Запуск: python -m pytest test_recurrence.py
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+def walk(rule: RecurrenceRule, dtstart: datetime, limit: int = 1000):
+    # Эталон: перебор всех повторений с самого начала, без _skip_to
+    result = []
+    for occurrence in rule.occurrences(dtstart):
+        if len(result) >= limit:
+            break
+        result.append(occurrence)
+    return result
+
+def test_parse_normalizes_rule():
+    rule = RecurrenceRule.parse("rrule:freq=weekly;byday=we,mo;interval=2")
+    assert str(rule) == "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE"
+
+@pytest.mark.parametrize("text", [
+    "FREQ=HOURLY",
+    "FREQ=DAILY;INTERVAL=0",
+    "FREQ=DAILY;COUNT=2;UNTIL=20250101",
+    "FREQ=MONTHLY;BYDAY=MO",
+    "FREQ=WEEKLY;BYDAY=XX",
+    "FREQ=DAILY;BYHOUR=9",
+])
+def test_parse_rejects_invalid_rules(text):
+    with pytest.raises(ValueError):
+        RecurrenceRule.parse(text)
+
+def test_until_date_is_inclusive_end_of_day():
+    rule = RecurrenceRule.parse("FREQ=DAILY;UNTIL=20250110")
+    assert rule.until == utc(2025, 1, 10, 23, 59, 59, 999999)
+    dtstart = utc(2025, 1, 1, 18, 0)
+    assert rule.last(dtstart) == utc(2025, 1, 10, 18, 0)
+    assert walk(rule, dtstart)[-1] == utc(2025, 1, 10, 18, 0)
+
+def test_until_datetime_is_utc():
+    rule = RecurrenceRule.parse("FREQ=DAILY;UNTIL=20250110T120000Z")
+    assert rule.until == utc(2025, 1, 10, 12, 0)
+    assert rule.last(utc(2025, 1, 1, 18, 0)) == utc(2025, 1, 9, 18, 0)
+
+def test_weekly_byday_with_interval():
+    # Среда 1 января 2025; каждые две недели по понедельникам и средам
+    rule = RecurrenceRule.parse("FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE")
+    dtstart = utc(2025, 1, 1, 9, 0)
+    assert walk(rule, dtstart, 5) == [
+        utc(2025, 1, 1, 9, 0),
+        utc(2025, 1, 13, 9, 0),
+        utc(2025, 1, 15, 9, 0),
+        utc(2025, 1, 27, 9, 0),
+        utc(2025, 1, 29, 9, 0),
+    ]
+
+@pytest.mark.parametrize("text", [
+    "FREQ=DAILY;INTERVAL=3",
+    "FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,WE,FR",
+    "FREQ=MONTHLY",
+    "FREQ=YEARLY",
+])
+def test_skip_matches_full_walk(text):
+    rule = RecurrenceRule.parse(text)
+    dtstart = utc(2024, 1, 31, 9, 0)
+    start = utc(2026, 3, 15)
+    expected = [occurrence for occurrence in walk(rule, dtstart) if occurrence >= start][:10]
+    assert rule.between(dtstart, start, utc(2100, 1, 1), limit=10) == expected
+
+@pytest.mark.parametrize("text", [
+    "FREQ=DAILY;INTERVAL=2;COUNT=20",
+    "FREQ=WEEKLY;BYDAY=MO,TH;COUNT=15",
+    "FREQ=MONTHLY;COUNT=14",
+    "FREQ=YEARLY;COUNT=3",
+])
+def test_count_across_skip(text):
+    # COUNT считается с dtstart, даже если перебор начинается с середины серии
+    rule = RecurrenceRule.parse(text)
+    dtstart = utc(2024, 2, 29, 9, 0)
+    everything = walk(rule, dtstart)
+    assert len(everything) == rule.count
+    start = everything[len(everything) // 2]
+    assert list(rule.occurrences(dtstart, start)) == everything[len(everything) // 2:]
+    assert rule.last(dtstart) == everything[-1]
+
+def test_monthly_31st_skips_short_months():
+    rule = RecurrenceRule.parse("FREQ=MONTHLY;COUNT=4")
+    dtstart = utc(2025, 1, 31, 9, 0)
+    assert walk(rule, dtstart) == [
+        utc(2025, 1, 31, 9, 0),
+        utc(2025, 3, 31, 9, 0),
+        utc(2025, 5, 31, 9, 0),
+        utc(2025, 7, 31, 9, 0),
+    ]
+    assert rule.first(dtstart, utc(2025, 4, 1)) == utc(2025, 5, 31, 9, 0)
+    assert rule.last(dtstart) == utc(2025, 7, 31, 9, 0)
+
+def test_yearly_feb_29_only_in_leap_years():
+    rule = RecurrenceRule.parse("FREQ=YEARLY;UNTIL=20330101")
+    dtstart = utc(2024, 2, 29, 9, 0)
+    assert walk(rule, dtstart) == [utc(2024, 2, 29, 9, 0), utc(2028, 2, 29, 9, 0), utc(2032, 2, 29, 9, 0)]
+    assert rule.first(dtstart, utc(2025, 1, 1)) == utc(2028, 2, 29, 9, 0)
+    assert rule.last(dtstart) == utc(2032, 2, 29, 9, 0)
+
+def test_last_is_none_for_endless_rule():
+    assert RecurrenceRule.parse("FREQ=DAILY").last(utc(2025, 1, 1)) is None
+
+def test_is_occurrence():
+    rule = RecurrenceRule.parse("FREQ=WEEKLY;BYDAY=MO")
+    dtstart = utc(2025, 1, 6, 9, 0)
+    assert rule.is_occurrence(dtstart, utc(2025, 1, 20, 9, 0))
+    assert not rule.is_occurrence(dtstart, utc(2025, 1, 21, 9, 0))
+    # Время без часового пояса считается UTC
+    assert rule.is_occurrence(dtstart, datetime(2025, 1, 13, 9, 0))
+
+@pytest.mark.parametrize("text", [
+    "FREQ=DAILY;COUNT=999999999",
+    "FREQ=MONTHLY;COUNT=200000",
+    "FREQ=DAILY;INTERVAL=5000000",
+    "FREQ=YEARLY;INTERVAL=100;COUNT=100",
+])
+def test_parse_rejects_huge_count_and_interval(text):
+    with pytest.raises(ValueError):
+        RecurrenceRule.parse(text)
+
+@pytest.mark.parametrize("text", [
+    "FREQ=DAILY;INTERVAL=3660;COUNT=1000",
+    "FREQ=WEEKLY;INTERVAL=522;COUNT=1000",
+    "FREQ=MONTHLY;INTERVAL=120;COUNT=1000",
+    "FREQ=YEARLY;INTERVAL=10;COUNT=1000",
+])
+def test_series_ends_at_last_representable_date(text):
+    # Повторения после 9999 года не существуют: серия просто заканчивается
+    rule = RecurrenceRule.parse(text)
+    dtstart = utc(2025, 1, 31, 9, 0)
+    everything = walk(rule, dtstart)
+    assert 0 < len(everything) < rule.count
+    assert everything[-1].year <= 9999
+    assert rule.last(dtstart) == everything[-1]
+    assert rule.between(dtstart, utc(9000, 1, 1), utc(9999, 12, 31), limit=2000) == [
+        occurrence for occurrence in everything if occurrence >= utc(9000, 1, 1)
+    ]
+
+def test_yearly_feb_29_ends_before_year_10000():
+    rule = RecurrenceRule.parse("FREQ=YEARLY;INTERVAL=10")
+    dtstart = utc(2024, 2, 29, 9, 0)
+    # 9994 — не високосный, 10004 не представим: перебор заканчивается, а не зависает
+    assert rule.first(dtstart, utc(9985, 1, 1)) is None
+    assert rule.first(dtstart, utc(9900, 1, 1)) == utc(9904, 2, 29, 9, 0)
@@ -0,0 +1,148 @@
+import asyncio
+import hashlib
+import math
+import os
+import time
+from datetime import datetime, timedelta, timezone
+from typing import Optional
+from sqlalchemy import select, delete
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import AsyncSessionLocal
+from models import RevokedToken
+
+# Параметры фильтра Блума: ожидаемое число отозванных токенов и доля ложных срабатываний
+REVOCATION_CAPACITY = int(os.getenv("REVOCATION_CAPACITY", "100000"))
+REVOCATION_FP_RATE = float(os.getenv("REVOCATION_FP_RATE", "0.001"))
+# Как часто подтягиваем отзывы, сделанные другими воркерами (секунды)
+REVOCATION_SYNC_INTERVAL = float(os.getenv("REVOCATION_SYNC_INTERVAL", "30"))
+# Как часто перестраиваем фильтр целиком, выбрасывая истёкшие токены (секунды)
+REVOCATION_REBUILD_INTERVAL = float(os.getenv("REVOCATION_REBUILD_INTERVAL", "3600"))
+
+class BloomFilter:
+    """Компактное множество: "нет" — точно нет, "да" — возможно да"""
+
+    def __init__(self, capacity: int, fp_rate: float):
+        capacity = max(capacity, 1)
+        self.size = max(8, int(-capacity * math.log(fp_rate) / (math.log(2) ** 2)))
+        self.hash_count = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+
+    def _positions(self, item: str):
+        # Двойное хеширование: k позиций из одного SHA-256
+        digest = hashlib.sha256(item.encode()).digest()
+        h1 = int.from_bytes(digest[:8], "big")
+        h2 = int.from_bytes(digest[8:16], "big") | 1
+        for i in range(self.hash_count):
+            yield (h1 + i * h2) % self.size
+
+    def add(self, item: str) -> None:
+        for pos in self._positions(item):
+            self.bits[pos >> 3] |= 1 << (pos & 7)
+
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[pos >> 3] & (1 << (pos & 7)) for pos in self._positions(item))
+
+class RevocationList:
+    """
+    Список отозванных jti: фильтр Блума в памяти поверх таблицы revoked_tokens.
+    Фильтр обновляет фоновая задача (start() из lifespan) — обработчики запросов
+    только читают его и ничего не пишут в БД.
+    """
+
+    def __init__(self, session_factory=AsyncSessionLocal):
+        self.session_factory = session_factory
+        self._bloom = BloomFilter(REVOCATION_CAPACITY, REVOCATION_FP_RATE)
+        self._synced_at: Optional[datetime] = None
+        self._last_rebuild = 0.0
+        self._lock = asyncio.Lock()
+        # jti, отозванные во время перестройки фильтра (None — перестройка не идёт)
+        self._pending: Optional[list] = None
+        self._task: Optional[asyncio.Task] = None
+
+    async def load(self, db: AsyncSession) -> None:
+        # Полная перезагрузка: чистим истёкшие записи и строим фильтр заново
+        now = datetime.now(timezone.utc)
+        await db.execute(delete(RevokedToken).where(RevokedToken.expires_at <= now))
+        await db.commit()
+        result = await db.execute(select(RevokedToken.jti))
+        bloom = BloomFilter(REVOCATION_CAPACITY, REVOCATION_FP_RATE)
+        for jti in result.scalars():
+            bloom.add(jti)
+        # Отзывы этого процесса, сделанные во время перестройки, не теряем
+        for jti in self._pending or ():
+            bloom.add(jti)
+        self._bloom = bloom
+        self._synced_at = now
+        self._last_rebuild = time.monotonic()
+
+    async def sync(self, db: AsyncSession) -> None:
+        # Подтягиваем отзывы, сделанные другими процессами
+        synced_at = datetime.now(timezone.utc)
+        # Окно с запасом на расхождение часов приложения и БД; повторное добавление в фильтр безвредно
+        since = self._synced_at - timedelta(seconds=REVOCATION_SYNC_INTERVAL)
+        result = await db.execute(
+            select(RevokedToken.jti).where(RevokedToken.revoked_at >= since)
+        )
+        for jti in result.scalars():
+            self._bloom.add(jti)
+        self._synced_at = synced_at
+
+    async def refresh(self) -> None:
+        # Одна перестройка/синхронизация за раз, в собственной сессии
+        async with self._lock:
+            self._pending = []
+            try:
+                async with self.session_factory() as db:
+                    if (
+                        self._synced_at is None
+                        or time.monotonic() - self._last_rebuild >= REVOCATION_REBUILD_INTERVAL
+                    ):
+                        await self.load(db)
+                    else:
+                        await self.sync(db)
+            finally:
+                self._pending = None
+
+    async def _run(self) -> None:
+        while True:
+            await asyncio.sleep(REVOCATION_SYNC_INTERVAL)
+            try:
+                await self.refresh()
+            except asyncio.CancelledError:
+                raise
+            except Exception as error:
+                # БД недоступна — работаем с уже загруженным фильтром
+                print(f" Список отозванных токенов: ошибка обновления {error!r}")
+
+    async def start(self) -> None:
+        # Первая загрузка — до приёма запросов, чтобы отозванные токены не проскочили
+        await self.refresh()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def is_revoked(self, db: AsyncSession, jti: str) -> bool:
+        # Частый случай "не отозван" решается без обращения к БД
+        if jti not in self._bloom:
+            return False
+        result = await db.execute(
+            select(RevokedToken.jti).where(RevokedToken.jti == jti)
+        )
+        return result.scalar_one_or_none() is not None
+
+    async def revoke(self, db: AsyncSession, jti: str, user_id: int, exp: int) -> None:
+        await db.merge(RevokedToken(
+            jti=jti,
+            user_id=user_id,
+            expires_at=datetime.fromtimestamp(exp, tz=timezone.utc)
+        ))
+        await db.commit()
+        self._bloom.add(jti)
+        if self._pending is not None:
+            self._pending.append(jti)
+
+revocation_list = RevocationList()